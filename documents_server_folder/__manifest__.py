@@ -1,6 +1,6 @@
 {
     "name": "Server Folder for Documents",
-    "version": "1.0",
+    "version": "1.1",
     "depends": [
         "documents",
         "documents_spreadsheet",
@@ -14,6 +14,8 @@ Manage document files on the server, but not as attachments.
 """,
     "data": [
         "views/res_users_views.xml",
+        "data/ir_cron_data.xml",
+        "data/ir_actions_server_data.xml",
     ],
     "summary": "Manage document files on the server, but not as attachments.",
     "sequence": 48,
@@ -5,10 +5,14 @@ from werkzeug.exceptions import BadRequest, Forbidden
 
 from odoo import _, http
 from odoo.http import request
-from odoo.tools import replace_exceptions
+from odoo.tools import replace_exceptions, str2bool
 
+from ..utils import scanner
+from ..utils.upload import upload_path, write_atomic, write_many
 from odoo.addons.documents.controllers.documents import ShareRoute
 
+UPLOAD_FSYNC_PARAM = "documents_server_folder.upload_fsync"
+
 ERR_MISSING_FILES = "missing files"
 ERR_MULTIPLE_FILES_INSIDE_DOC = "cannot save multiple files inside a single document"
 ERR_ONLY_INTERNAL_USERS_CAN_UPLOAD_FILES = "only internal users can upload files"
@@ -119,6 +123,13 @@ class DsfShareRoute(ShareRoute):
             document_ids.append(document_sudo.id)
         else:
             folder_sudo = document_sudo
+            # The files are written in parallel, the documents created after.
+            folder_path = folder_sudo.get_full_path()
+            write_many(
+                files,
+                [upload_path(folder_path, file.filename) for file in files],
+                self._upload_fsync(),
+            )
             for file in files:
                 document_sudo = self._documents_upload_to_the_server_create_write(
                     folder_sudo,
@@ -134,6 +145,7 @@ class DsfShareRoute(ShareRoute):
                         "res_model": res_model,
                         "res_id": res_id,
                     },
+                    written=True,
                 )
                 document_ids.append(document_sudo.id)
 
@@ -147,27 +159,46 @@ class DsfShareRoute(ShareRoute):
 
         return document_ids
 
-    def _documents_upload_to_the_server_create_write(self, document_sudo, vals):
+    def _upload_fsync(self):
+        ICP = request.env["ir.config_parameter"].sudo()
+        return str2bool(ICP.get_param(UPLOAD_FSYNC_PARAM, "False"))
+
+    def _documents_upload_to_the_server_create_write(
+        self,
+        document_sudo,
+        vals,
+        written=False,
+    ):
         """
         The actual function that either write vals on a binary document
         or create a new document with vals inside a folder document.
+
+        :param written: the file is already written in the folder
         """
         if document_sudo.type == "binary":
             path = document_sudo.get_full_path()
-            with open(path, "wb") as f:
-                f.write(vals["file"].read())
+            write_atomic(vals["file"], path, self._upload_fsync())
+            # The replaced file may keep the mtime of its directory unchanged.
+            scanner.invalidate(os.path.dirname(path))
         else:
             folder_path = document_sudo.get_full_path()
-            file_name = vals["file"].filename
-            path = os.path.join(folder_path, file_name)
-            path = os.path.normpath(os.path.normcase(path))
-            with open(path, "wb") as f:
-                f.write(vals["file"].read())
+            file_name = os.path.basename(vals["file"].filename)
+            if not written:
+                write_atomic(
+                    vals["file"],
+                    upload_path(folder_path, file_name),
+                    self._upload_fsync(),
+                )
             document_sudo = document_sudo.create_file(
                 document_sudo.id,
                 folder_path,
                 file_name,
             )
+        # Rehash the new content in the background.
+        document_sudo.write({"server_checksum": False, "server_checksum_key": False})
+        request.env.ref(
+            "documents_server_folder.ir_cron_hash_server_files",
+        ).sudo()._trigger()
 
         if not document_sudo.res_model:
             document_sudo.res_model = "documents.document"
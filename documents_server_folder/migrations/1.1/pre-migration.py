@@ -0,0 +1,33 @@
+def migrate(cr, version):
+    """Fill the relative paths of the server documents in a single query.
+
+    The column is created here so that the ORM doesn't compute the paths
+    record by record, ancestor by ancestor, when the field is added.
+    """
+    cr.execute(
+        """
+        ALTER TABLE documents_document
+            ADD COLUMN IF NOT EXISTS server_rel_path varchar
+        """,
+    )
+    cr.execute(
+        """
+        WITH RECURSIVE tree (id, rel_path) AS (
+            SELECT id, ''::varchar
+            FROM documents_document
+            WHERE located_on_the_server AND folder_id IS NULL
+            UNION ALL
+            SELECT d.id,
+                CASE WHEN t.rel_path = '' THEN d.name
+                    ELSE t.rel_path || '/' || d.name
+                END
+            FROM documents_document d
+            JOIN tree t ON d.folder_id = t.id
+            WHERE d.located_on_the_server
+        )
+        UPDATE documents_document d
+        SET server_rel_path = tree.rel_path
+        FROM tree
+        WHERE d.id = tree.id
+        """,
+    )
@@ -1,16 +1,20 @@
 import base64
+import hashlib
 import io
+import logging
 import mimetypes
 import os
 import shutil
 import zipfile
-from collections import OrderedDict
+from collections import Counter, OrderedDict
 
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 from odoo.osv import expression
 from odoo.tools import image_process
 
+from ..utils import scanner, thumbnails
+from ..utils.checksum import entry_key, file_checksum, stat_key
 from odoo.addons.documents.models.documents_document import (
     Document as Document_for_patching,
 )
@@ -19,6 +23,11 @@ from odoo.addons.documents_spreadsheet.models.documents_document import (
     XLSX_MIME_TYPES,
 )
 
+_logger = logging.getLogger(__name__)
+
+# Server files hashed by a run of the checksum cron.
+CHECKSUM_BATCH_SIZE = 200
+
 
 class Document(models.Model):
     _inherit = "documents.document"
@@ -29,6 +38,32 @@ class Document(models.Model):
     )
     has_children = fields.Boolean("Does it have child folders?", default=False)
     fetch_dt = fields.Datetime()
+    server_rel_path = fields.Char(
+        "Path relative to the server folder",
+        compute="_compute_server_rel_path",
+        store=True,
+        recursive=True,
+        index=True,
+    )
+    server_fingerprint = fields.Char(
+        "Fingerprint of the server directory at the last sync",
+        copy=False,
+    )
+    server_checksum = fields.Char(
+        "SHA1 of the server file content",
+        copy=False,
+        index=True,
+    )
+    server_checksum_key = fields.Char(
+        "mtime and size of the server file when it was hashed",
+        copy=False,
+    )
+    # A Char, inode numbers don't fit the int4 column of an Integer field.
+    server_inode = fields.Char("Inode of the server entry", copy=False)
+    thumbnail_status = fields.Selection(
+        selection_add=[("pending", "Pending")],
+        ondelete={"pending": "set null"},
+    )
 
     @api.depends(
         "attachment_id",
@@ -41,10 +76,26 @@ class Document(models.Model):
         files = server_docs.filtered(lambda x: x.type != "folder")
         for document in files:
             path = document.get_path()
-            file_path = os.path.join(document.root_path, path)
-            document.file_size = os.path.getsize(file_path)
+            entry = scanner.stat(os.path.join(document.root_path, path))
+            document.file_size = entry.size if entry else 0
         super(Document, other_docs)._compute_file_size()
 
+    @api.depends("name", "located_on_the_server", "folder_id.server_rel_path")
+    def _compute_server_rel_path(self):
+        for document in self:
+            if not document.located_on_the_server:
+                document.server_rel_path = False
+            elif not document.folder_id:
+                # The root SERVER_FOLDER stands for the root path itself.
+                document.server_rel_path = ""
+            elif document.folder_id.server_rel_path:
+                document.server_rel_path = os.path.join(
+                    document.folder_id.server_rel_path,
+                    document.name,
+                )
+            else:
+                document.server_rel_path = document.name
+
     def _register_hook(self):
         super()._register_hook()
 
@@ -275,62 +326,61 @@ class Document(models.Model):
 
     @api.model
     def check_has_children(self, path=""):
-        entry_full_path = os.path.join(self.root_path, path)
-        if os.path.isdir(entry_full_path):
-            return any(
-                os.path.isdir(os.path.join(entry_full_path, child))
-                for child in os.listdir(entry_full_path)
-            )
-        return False
+        try:
+            _mtime, entries = scanner.scan(os.path.join(self.root_path, path))
+        except OSError:
+            return False
+        return any(entry.is_dir for entry in entries.values())
 
     @api.model
-    def create_folder(self, folder_id, folder_name):
-        folder = self.env["documents.document"].search(
+    def _server_document_vals(self, folder_id, name, is_dir):
+        """Return the create values of a server folder or file."""
+        vals = {
+            "type": "folder" if is_dir else "binary",
+            "located_on_the_server": True,
+            "folder_id": folder_id,
+            "name": name,
+            "owner_id": self.env.user.id,
+        }
+        if not is_dir:
+            mimetype, _encoding = mimetypes.guess_type(name)
+            vals["mimetype"] = mimetype or "application/octet-stream"
+        return vals
+
+    @api.model
+    def _find_server_child(self, folder_id, name, doc_type):
+        return self.env["documents.document"].search(
             [
-                ("type", "=", "folder"),
+                ("type", "=", doc_type),
                 ("located_on_the_server", "=", True),
                 ("folder_id", "=", folder_id),
-                ("name", "=", folder_name),
+                ("name", "=", name),
                 ("owner_id", "=", self.env.user.id),
             ],
+            limit=1,
         )
+
+    @api.model
+    def create_folder(self, folder_id, folder_name):
+        folder = self._find_server_child(folder_id, folder_name, "folder")
         if folder:
             return folder
-        return self.env["documents.document"].create(
-            {
-                "type": "folder",
-                "located_on_the_server": True,
-                "folder_id": folder_id,
-                "name": folder_name,
-                "owner_id": self.env.user.id,
-                "has_children": self.check_has_children(""),
-            },
-        )
+        # The root SERVER_FOLDER stands for the root path itself.
+        path = ""
+        if folder_id:
+            parent_path = self.env["documents.document"].browse(folder_id).get_path()
+            path = os.path.join(parent_path, folder_name)
+        vals = self._server_document_vals(folder_id, folder_name, True)
+        vals["has_children"] = self.check_has_children(path)
+        return self.env["documents.document"].create(vals)
 
     @api.model
     def create_file(self, folder_id, folder_full_path, file_name):
-        file_full_path = os.path.join(folder_full_path, file_name)
-        mimetype, _ = mimetypes.guess_type(file_full_path)
-        file = self.env["documents.document"].search(
-            [
-                ("type", "=", "binary"),
-                ("located_on_the_server", "=", True),
-                ("folder_id", "=", folder_id),
-                ("name", "=", file_name),
-                ("owner_id", "=", self.env.user.id),
-            ],
-        )
+        file = self._find_server_child(folder_id, file_name, "binary")
         if file:
             return file
         return self.env["documents.document"].create(
-            {
-                "type": "binary",
-                "located_on_the_server": True,
-                "folder_id": folder_id,
-                "name": file_name,
-                "owner_id": self.env.user.id,
-                "mimetype": mimetype or "application/octet-stream",
-            },
+            self._server_document_vals(folder_id, file_name, False),
         )
 
     def populate_folder(self):
@@ -339,28 +389,183 @@ class Document(models.Model):
             return
         if not self.root_path:
             return
-        if self.name == "SERVER_FOLDER":
-            self.has_children = self.check_has_children()
-        if not self.has_children or self.fetch_dt:
+        self._sync_server_folder()
+        self._refresh_pending_thumbnails()
+
+    def _refresh_pending_thumbnails(self):
+        """Store the thumbnails of the children made since the last listing."""
+        self.ensure_one()
+        pending = self.env["documents.document"].search(
+            [("folder_id", "=", self.id), ("thumbnail_status", "=", "pending")],
+        )
+        if pending:
+            pending._compute_thumbnail()
+
+    @api.model
+    def _scan_directory(self, full_path):
+        """Return the fingerprint and the scanner entries of a server directory.
+
+        The fingerprint changes with the mtime of the directory, its number
+        of entries, their names and the file sizes and mtimes, which also
+        change when a file is rewritten in place.
+        """
+        mtime, entries = scanner.scan(full_path)
+        digest = hashlib.sha1()
+        for name in sorted(entries):
+            entry = entries[name]
+            digest.update(
+                f"{name}/{int(entry.is_dir)}/{entry.size}/{entry.mtime_ns}\n".encode(
+                    errors="replace",
+                ),
+            )
+        return f"{mtime}:{len(entries)}:{digest.hexdigest()}", entries
+
+    def _sync_server_folder(self):
+        """Reconcile the children of the server folder with its directory.
+
+        Nothing is read from the database when the fingerprint of the
+        directory is the one of the last sync. Otherwise the new entries are
+        created and the vanished ones unlinked in batch. A renamed entry
+        keeps its document, which gets the new name.
+
+        :return: whether the children were reconciled
+        """
+        self.ensure_one()
+        full_path = self.get_full_path(check_exist=False)
+        if not full_path:
+            return False
+        try:
+            fingerprint, entries = self._scan_directory(full_path)
+        except OSError:
+            return False
+        if fingerprint == self.server_fingerprint:
+            return False
+
+        Document = self.env["documents.document"]
+        children = Document.with_context(active_test=False).search_fetch(
+            [("folder_id", "=", self.id)],
+            [
+                "name",
+                "type",
+                "active",
+                "file_size",
+                "server_inode",
+                "server_checksum_key",
+            ],
+        )
+        known = {}
+        removed = Document
+        changed = Document
+        for child in children.filtered("active"):
+            entry = entries.get(child.name)
+            is_dir = child.type == "folder"
+            if entry is None or entry.is_dir != is_dir or child.name in known:
+                removed |= child
+                continue
+            known[child.name] = child
+            if child.server_inode != str(entry.inode):
+                child.server_inode = str(entry.inode)
+            if is_dir:
+                continue
+            # The checksum of a file rewritten since it was hashed is stale.
+            if child.file_size != entry.size or child.server_checksum_key not in (
+                False,
+                "error",
+                entry_key(entry),
+            ):
+                if child.file_size != entry.size:
+                    child.file_size = entry.size
+                changed |= child
+        renamed = self._match_renamed(
+            removed,
+            {name: entry for name, entry in entries.items() if name not in known},
+        )
+        for name, child in renamed.items():
+            vals = self._server_document_vals(self.id, name, child.type == "folder")
+            # Already renamed on the disk, write() would rename it again.
+            super(Document, child).write(
+                {key: vals[key] for key in ("name", "mimetype") if key in vals},
+            )
+            known[name] = child
+            removed -= child
+        self._unlink_vanished(removed)
+        # A changed image gets a new thumbnail cache key.
+        changed.filtered(
+            lambda x: x.mimetype and x.mimetype.startswith("image/"),
+        )._compute_thumbnail()
+
+        # New folders learn whether they have subfolders at their own sync.
+        vals_list = []
+        for name, entry in sorted(entries.items()):
+            if name not in known:
+                vals = self._server_document_vals(self.id, name, entry.is_dir)
+                vals["server_inode"] = str(entry.inode)
+                vals_list.append(vals)
+        if changed:
+            changed.write({"server_checksum": False, "server_checksum_key": False})
+        if vals_list:
+            Document.create(vals_list)
+        if changed or any(vals["type"] == "binary" for vals in vals_list):
+            self.env.ref("documents_server_folder.ir_cron_hash_server_files")._trigger()
+        self.write(
+            {
+                "server_fingerprint": fingerprint,
+                "has_children": any(entry.is_dir for entry in entries.values()),
+                "fetch_dt": fields.Datetime.now(),
+            },
+        )
+        return True
+
+    @api.model
+    def _match_renamed(self, documents, entries):
+        """Return the vanished documents renamed as new entries, by new name.
+
+        A renamed entry keeps its inode, and a file its size. A document and
+        an entry are only paired when no other one has the same type, inode
+        and size, so hard links and reused inodes stay new entries.
+
+        :param documents: the children gone from the directory
+        :param entries: the scanner entries of the names without a document
+        """
+
+        def document_key(document):
+            if document.type == "folder":
+                return True, document.server_inode, 0
+            return False, document.server_inode, document.file_size
+
+        documents = documents.filtered("server_inode")
+        by_key = {document_key(document): document for document in documents}
+        counts = Counter(map(document_key, documents))
+        counts.update(
+            (entry.is_dir, str(entry.inode), entry.size) for entry in entries.values()
+        )
+        renamed = {}
+        for name, entry in entries.items():
+            key = (entry.is_dir, str(entry.inode), entry.size)
+            if key in by_key and counts[key] == 2:
+                renamed[name] = by_key[key]
+        return renamed
+
+    @api.model
+    def _unlink_vanished(self, documents):
+        """Unlink server documents gone from the disk, with their descendants.
+
+        Spreadsheets only live in the database, they are kept along with the
+        folders leading to them.
+        """
+        if not documents:
             return
-        children = (
-            self.env["documents.document"]
-            .with_context(active_test=False)
-            .search([("id", "child_of", self.id)])
+        descendants = self.with_context(active_test=False).search(
+            [("id", "child_of", documents.ids)],
         )
-        # (children - self).unlink()
-        for child in children - self:
-            if not child._exist_on_the_server() and not child.spreadsheet_data:
-                child.unlink()
-        folder_path = self.get_path()
-        folder_full_path = os.path.join(self.root_path, folder_path)
-        if os.path.isdir(folder_full_path):
-            for child in os.listdir(folder_full_path):
-                if os.path.isdir(os.path.join(folder_full_path, child)):
-                    self.create_folder(self.id, child)
-                elif os.path.isfile(os.path.join(folder_full_path, child)):
-                    self.create_file(self.id, folder_full_path, child)
-        self.fetch_dt = fields.Datetime.now()
+        kept_ids = {
+            int(folder_id)
+            for document in descendants.filtered(
+                lambda x: x.type != "folder" and x.spreadsheet_data,
+            )
+            for folder_id in document.parent_path.split("/")[:-1]
+        }
+        descendants.filtered(lambda x: x.id not in kept_ids).unlink()
 
     @api.model
     @api.readonly
@@ -406,12 +611,7 @@ class Document(models.Model):
 
     def get_path(self):
         self.ensure_one()
-        names = []
-        parent_path_list = self.parent_path.split("/")[1:-1]
-        for folder_id in parent_path_list:
-            doc = self.env["documents.document"].browse(int(folder_id))
-            names.append(doc.name)
-        return "/".join(names)
+        return self.server_rel_path or ""
 
     def get_full_path(self, check_exist=True):
         self.ensure_one()
@@ -423,7 +623,7 @@ class Document(models.Model):
         if not is_abs:
             raise FileNotFoundError("File not found: " + full_path)
         full_path = os.path.normpath(os.path.normcase(full_path))
-        if self.active and not os.path.exists(full_path):
+        if self.active and not scanner.stat(full_path):
             if check_exist:
                 raise FileNotFoundError("File not found: " + full_path)
             return None
@@ -450,13 +650,26 @@ class Document(models.Model):
         return documents
 
     def write(self, vals):
+        """Rename or move the server items on the disk too.
+
+        The stored paths of the items, and of their descendants, follow
+        through the recompute of server_rel_path.
+        """
         name = vals.get("name")
-        if name and self.located_on_the_server:
-            old_path = self.get_full_path()
-            folder_path = os.path.dirname(old_path)
-            new_path = os.path.join(folder_path, name)
-            if old_path != new_path:
-                os.rename(old_path, new_path)
+        folder = None
+        if vals.get("folder_id"):
+            folder = self.env["documents.document"].browse(vals["folder_id"])
+            if not folder.located_on_the_server:
+                folder = None
+        if name or folder:
+            for document in self.filtered("located_on_the_server"):
+                old_path = document.get_full_path()
+                folder_path = (
+                    folder.get_full_path() if folder else os.path.dirname(old_path)
+                )
+                new_path = os.path.join(folder_path, name or document.name)
+                if old_path != new_path:
+                    os.rename(old_path, new_path)
         return super().write(vals)
 
     def toggle_active(self):
@@ -506,6 +719,15 @@ class Document(models.Model):
                 # Thumbnails of pdfs are generated by the client. To force the generation, we invalidate the thumbnail.
                 document.thumbnail = False
                 document.thumbnail_status = "client_generated"
+            elif (
+                document.located_on_the_server
+                and document.mimetype
+                and document.mimetype.startswith("image/")
+            ):
+                path = document.get_full_path(check_exist=False)
+                status, thumbnail = thumbnails.get(path) if path else ("error", None)
+                document.thumbnail = base64.b64encode(thumbnail) if thumbnail else False
+                document.thumbnail_status = status
             elif document.mimetype and document.mimetype.startswith("image/"):
                 try:
                     document.thumbnail = base64.b64encode(
@@ -543,30 +765,95 @@ class Document(models.Model):
         except FileNotFoundError:
             return False
 
-    def refresh_server_folder(self):
+    @api.model
+    def _cron_hash_server_files(self):
+        """Store the checksums of the server files that weren't hashed yet.
+
+        A file whose key no longer matches its stat at the folder sync is
+        cleared and hashed again. A file that can't be read is marked so
+        that it isn't retried until the folder sync sees its size change.
+        """
+        documents = self.search(
+            [
+                ("located_on_the_server", "=", True),
+                ("type", "=", "binary"),
+                ("server_checksum_key", "=", False),
+            ],
+            limit=CHECKSUM_BATCH_SIZE,
+        )
+        # The paths are relative to the server folder of the owner.
+        for owner, owner_documents in documents.grouped("owner_id").items():
+            for document in owner_documents.with_user(owner).sudo():
+                path = document.get_full_path(check_exist=False)
+                try:
+                    if not path:
+                        raise FileNotFoundError(document.server_rel_path)
+                    checksum, key = file_checksum(path)
+                except OSError as e:
+                    _logger.info("Cannot hash the server file %s: %s", path, e)
+                    checksum, key = False, "error"
+                document.write(
+                    {"server_checksum": checksum, "server_checksum_key": key},
+                )
+            self.env.cr.commit()
+        if len(documents) == CHECKSUM_BATCH_SIZE:
+            self.env.ref("documents_server_folder.ir_cron_hash_server_files")._trigger()
+
+    def _get_server_checksum(self, path):
+        """Return the stored checksum if the file is unchanged since it was hashed."""
         self.ensure_one()
-        items_to_unlink = self.env["documents.document"]
-
-        child_folders = self.children_ids.filtered(lambda x: x.type == "folder")
-        for folder in child_folders:
-            folder.refresh_server_folder()
-
-        child_files = self.children_ids - child_folders
-        for file in child_files:
-            if (
-                file.type == "binary"
-                and not file._exist_on_the_server()
-                and not file.spreadsheet_data
-            ):
-                items_to_unlink += file
+        if not self.server_checksum:
+            return None
+        try:
+            key = stat_key(os.stat(path))
+        except OSError:
+            return None
+        return self.server_checksum if key == self.server_checksum_key else None
+
+    def action_view_server_duplicates(self):
+        """List the server files whose content is stored more than once."""
+        groups = self._read_group(
+            [("located_on_the_server", "=", True), ("server_checksum", "!=", False)],
+            ["server_checksum"],
+            ["__count"],
+            having=[("__count", ">", 1)],
+        )
+        checksums = [checksum for checksum, _count in groups]
+        return {
+            "type": "ir.actions.act_window",
+            "name": _("Duplicate Server Files"),
+            "res_model": "documents.document",
+            "view_mode": "list,form",
+            "views": [(False, "list"), (False, "form")],
+            "domain": [("server_checksum", "in", checksums)],
+            "context": {"group_by": "server_checksum"},
+        }
 
-        items_to_unlink.unlink()
+    def refresh_server_folder(self):
+        """Sync the whole tree of the server folder with the disk.
+
+        The directories are first listed in parallel by the scanner, then
+        only those whose fingerprint changed are reconciled with their
+        documents.
+        """
+        self.ensure_one()
+        full_path = self.get_full_path(check_exist=False)
+        if full_path:
+            scanner.walk(full_path)
+        Document = self.env["documents.document"]
+        folders = self
+        while folders:
+            for folder in folders:
+                folder._sync_server_folder()
+            folders = Document.search(
+                [
+                    ("folder_id", "in", folders.ids),
+                    ("type", "=", "folder"),
+                    ("located_on_the_server", "=", True),
+                ],
+            )
         if not self.children_ids and not self._exist_on_the_server():
             self.unlink()
-        else:
-            self.fetch_dt = False
-            (child_files - items_to_unlink)._compute_file_size()
-
         return {"type": "ir.actions.client", "tag": "reload"}
 
     def _extract_pdf_from_xml(self):
@@ -5,6 +5,7 @@ import os
 from io import BytesIO
 from os.path import join as opj
 from pathlib import Path
+from urllib.parse import quote
 from zlib import adler32
 
 from odoo.http import Response, request
@@ -21,6 +22,40 @@ ERR_CANNOT_READ_URL = "Cannot read an URL"
 # content (usually using a hash), one year.
 STATIC_CACHE_LONG = 60 * 60 * 24 * 365
 
+# Option of the configuration file mapping server folder roots to internal
+# nginx locations, so that their files are also sent by X-Accel-Redirect:
+#
+#   dsf_x_accel_mapping = /srv/documents=/server_folder/
+#
+# with a matching location in nginx:
+#
+#   location /server_folder/ { internal; alias /srv/documents/; }
+#
+# Several roots are separated by commas.
+X_ACCEL_MAPPING_OPTION = "dsf_x_accel_mapping"
+
+
+def _x_accel_mapping():
+    """Return the (root, location) pairs of the configuration, longest root first."""
+    mapping = []
+    for item in (config.get(X_ACCEL_MAPPING_OPTION) or "").split(","):
+        root, sep, location = item.partition("=")
+        if sep and root.strip() and location.strip():
+            mapping.append((Path(root.strip()), location.strip().rstrip("/")))
+    return sorted(mapping, key=lambda pair: len(pair[0].parts), reverse=True)
+
+
+def x_accel_redirect(path):
+    """Return the internal nginx URL serving the path, or None."""
+    with contextlib.suppress(ValueError):
+        fspath = Path(path).relative_to(opj(config["data_dir"], "filestore"))
+        return f"/web/filestore/{fspath}"
+    for root, location in _x_accel_mapping():
+        with contextlib.suppress(ValueError):
+            relative = Path(path).relative_to(root)
+            return f"{location}/{quote(relative.as_posix())}"
+    return None
+
 
 class DsfStream:
     """
@@ -52,6 +87,7 @@ class DsfStream:
     immutable = False
     size = None
     public = False
+    checksum = None
 
     def __init__(self, **kwargs):
         # Remove class methods from the instances
@@ -59,7 +95,14 @@ class DsfStream:
         self.__dict__.update(kwargs)
 
     @classmethod
-    def from_path(cls, path):
+    def from_path(cls, path, checksum=None):
+        """Create a :class:`~Stream`: from a server file.
+
+        :param checksum: checksum of the file content, used as a strong
+            ETag and as the only ``unique`` URL token under which the file
+            is cached as immutable. Without it the ETag is derived from the
+            path, the mtime in nanoseconds and the size.
+        """
         is_abs = os.path.isabs(path)
         if not is_abs:
             raise FileNotFoundError("File not found: " + path)
@@ -73,10 +116,11 @@ class DsfStream:
             path=path,
             mimetype=mimetypes.guess_type(path)[0],
             download_name=os.path.basename(path),
-            etag=f"{int(stat.st_mtime)}-{stat.st_size}-{check}",
+            etag=checksum or f"{stat.st_mtime_ns}-{stat.st_size}-{check}",
             last_modified=stat.st_mtime,
             size=stat.st_size,
             public=False,
+            checksum=checksum,
         )
 
     @classmethod
@@ -160,6 +204,18 @@ class DsfStream:
             as_attachment = self.as_attachment
         if immutable is None:
             immutable = self.immutable
+        if (
+            immutable
+            and self.type == "path"
+            and (
+                not self.checksum
+                or request.httprequest.args.get("unique") != self.checksum
+            )
+        ):
+            # A server file changes under the same URL, any other token
+            # than its checksum may outlive its content.
+            immutable = False
+            send_file_kwargs.pop("max_age", None)
 
         send_file_kwargs = {
             "mimetype": self.mimetype,
@@ -177,18 +233,14 @@ class DsfStream:
         if self.type == "data":
             res = _send_file(BytesIO(self.data), **send_file_kwargs)
         else:  # self.type == 'path'
-            send_file_kwargs["use_x_sendfile"] = False
-            if config["x_sendfile"]:
-                with contextlib.suppress(ValueError):  # outside of the filestore
-                    fspath = Path(self.path).relative_to(
-                        opj(config["data_dir"], "filestore"),
-                    )
-                    x_accel_redirect = f"/web/filestore/{fspath}"
-                    send_file_kwargs["use_x_sendfile"] = True
+            # Streamed by the worker, Range and conditional requests are
+            # answered by send_file (partial content, 304 and 412).
+            redirect = x_accel_redirect(self.path) if config["x_sendfile"] else None
+            send_file_kwargs["use_x_sendfile"] = bool(redirect)
 
             res = _send_file(self.path, **send_file_kwargs)
             if "X-Sendfile" in res.headers:
-                res.headers["X-Accel-Redirect"] = x_accel_redirect
+                res.headers["X-Accel-Redirect"] = redirect
 
                 # In case of X-Sendfile/X-Accel-Redirect, the body is empty,
                 # yet werkzeug gives the length of the file. This makes
@@ -12,5 +12,6 @@ class IrBinary(models.AbstractModel):
             and field_name == "raw"
             and record.located_on_the_server
         ):
-            return DsfStream.from_path(record.get_full_path())
+            path = record.get_full_path()
+            return DsfStream.from_path(path, record._get_server_checksum(path))
         return super()._record_to_stream(record, field_name)
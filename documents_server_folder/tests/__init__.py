@@ -0,0 +1 @@
+from . import test_download, test_sync
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from odoo.tests import HttpCase, tagged
+from odoo.tools import config
+
+from odoo.addons.documents_server_folder.utils.checksum import file_checksum
+
+
+@tagged("post_install", "-at_install")
+class TestDownload(HttpCase):
+    """Range and conditional requests of the files streamed by the worker."""
+
+    CONTENT = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with open(os.path.join(root, "sample.bin"), "wb") as f:
+            f.write(self.CONTENT)
+        admin = self.env.ref("base.user_admin")
+        admin.server_folder_path = root
+        Document = self.env["documents.document"].with_user(admin)
+        folder = Document.create_folder(False, "SERVER_FOLDER")
+        self.document = Document.create_file(folder.id, root, "sample.bin")
+        self.path = os.path.join(root, "sample.bin")
+        # Without X-Sendfile the file is streamed by send_file.
+        self.startPatcher(patch.dict(config.options, {"x_sendfile": False}))
+        self.authenticate("admin", "admin")
+        self.url = f"/web/content/documents.document/{self.document.id}/raw"
+
+    def test_range(self):
+        response = self.url_open(self.url, headers={"Range": "bytes=10-19"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(response.content, self.CONTENT[10:20])
+
+    def test_if_range(self):
+        etag = self.url_open(self.url).headers["ETag"]
+        response = self.url_open(
+            self.url,
+            headers={"Range": "bytes=0-9", "If-Range": etag},
+        )
+        self.assertEqual(response.status_code, 206)
+        response = self.url_open(
+            self.url,
+            headers={"Range": "bytes=0-9", "If-Range": '"outdated"'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.CONTENT)
+
+    def test_not_modified(self):
+        response = self.url_open(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.CONTENT)
+        response = self.url_open(
+            self.url,
+            headers={"If-None-Match": response.headers["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+
+    def test_precondition_failed(self):
+        etag = self.url_open(self.url).headers["ETag"]
+        response = self.url_open(self.url, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        response = self.url_open(self.url, headers={"If-Match": '"outdated"'})
+        self.assertEqual(response.status_code, 412)
+
+    def test_immutable(self):
+        checksum, key = file_checksum(self.path)
+        self.document.write({"server_checksum": checksum, "server_checksum_key": key})
+        response = self.url_open(f"{self.url}?unique={checksum}")
+        self.assertEqual(response.headers["ETag"], f'"{checksum}"')
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        # Any other token may outlive the content of the file.
+        response = self.url_open(f"{self.url}?unique=outdated")
+        self.assertNotIn("immutable", response.headers["Cache-Control"])
+        self.assertNotIn("max-age", response.headers["Cache-Control"])
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.documents_server_folder.utils import scanner
+from odoo.addons.documents_server_folder.utils.checksum import file_checksum
+
+
+@tagged("post_install", "-at_install")
+class TestSync(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.path = os.path.join(self.root, "sample.bin")
+        with open(self.path, "wb") as f:
+            f.write(b"0" * 64)
+        admin = self.env.ref("base.user_admin")
+        admin.server_folder_path = self.root
+        Document = self.env["documents.document"].with_user(admin)
+        self.folder = Document.create_folder(False, "SERVER_FOLDER")
+        self.folder._sync_server_folder()
+        self.document = Document.search([("folder_id", "=", self.folder.id)])
+
+    def test_rewritten_in_place(self):
+        checksum, key = file_checksum(self.path)
+        self.document.write({"server_checksum": checksum, "server_checksum_key": key})
+        with open(self.path, "r+b") as f:
+            f.write(b"1" * 64)
+        mtime_ns = os.stat(self.path).st_mtime_ns + 10**9
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+        # The mtime of the directory is unchanged, its listing still cached.
+        scanner.invalidate(self.root)
+
+        self.assertTrue(self.folder._sync_server_folder())
+        self.assertFalse(self.document.server_checksum)
+        self.assertFalse(self.document.server_checksum_key)
+        self.assertEqual(self.document.file_size, 64)
+
+    def test_unchanged(self):
+        checksum, key = file_checksum(self.path)
+        self.document.write({"server_checksum": checksum, "server_checksum_key": key})
+        self.folder.server_fingerprint = False
+
+        self.assertTrue(self.folder._sync_server_folder())
+        self.assertEqual(self.document.server_checksum, checksum)
+
+    def test_renamed(self):
+        os.mkdir(os.path.join(self.root, "sub"))
+        scanner.invalidate(self.root)
+        self.folder._sync_server_folder()
+        subfolder = self.document.search(
+            [("folder_id", "=", self.folder.id), ("name", "=", "sub")],
+        )
+        os.rename(self.path, os.path.join(self.root, "renamed.txt"))
+        os.rename(os.path.join(self.root, "sub"), os.path.join(self.root, "moved"))
+        scanner.invalidate(self.root)
+
+        self.assertTrue(self.folder._sync_server_folder())
+        children = self.document.search([("folder_id", "=", self.folder.id)])
+        self.assertEqual(children, self.document | subfolder)
+        self.assertEqual(self.document.name, "renamed.txt")
+        self.assertEqual(self.document.mimetype, "text/plain")
+        self.assertEqual(self.document.server_rel_path, "renamed.txt")
+        self.assertEqual(subfolder.name, "moved")
+
+    def test_upload_in_progress(self):
+        tmp_name = f".upload.bin.{'0' * 32}.part"
+        with open(os.path.join(self.root, tmp_name), "wb") as f:
+            f.write(b"0" * 32)
+        scanner.invalidate(self.root)
+
+        self.folder._sync_server_folder()
+        children = self.document.search([("folder_id", "=", self.folder.id)])
+        self.assertEqual(children, self.document)
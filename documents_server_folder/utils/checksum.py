@@ -0,0 +1,29 @@
+"""Content checksums of the server folder files."""
+
+import hashlib
+import os
+
+CHUNK_SIZE = 1024 * 1024  # bytes
+
+
+def stat_key(stat):
+    """Return the key under which a checksum stays valid for the file stat."""
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def entry_key(entry):
+    """Return the :func:`stat_key` of a scanner entry."""
+    return f"{entry.mtime_ns}:{entry.size}"
+
+
+def file_checksum(path):
+    """Return the sha1 of the file content and the stat key it was read under.
+
+    :raise OSError: when the file can't be read
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest(), stat_key(stat)
@@ -0,0 +1,142 @@
+"""Cached scandir listings of the server folders.
+
+A directory is listed once with ``os.scandir`` and its entries, with the
+stat results of the files, are kept in the process for ``CACHE_TTL``
+seconds, as long as the mtime of the directory doesn't change. The size,
+type and existence checks of the documents read these listings instead of
+stat'ing the same paths again.
+
+The mtime of a directory doesn't change when a file is rewritten in place,
+so a file size may lag for up to ``CACHE_TTL`` seconds. The temporary
+files of the uploads in progress are left out of the listings.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from stat import S_ISDIR, S_ISREG
+from typing import NamedTuple
+
+from .upload import is_upload_tmp
+
+CACHE_TTL = 10  # seconds
+CACHE_MAX_SIZE = 4096  # directories
+SCAN_WORKERS = 4
+
+SCAN_POOL = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="dsf_scan")
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class Entry(NamedTuple):
+    is_dir: bool
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+def scan(path):
+    """Return the mtime of the directory and its entries by name.
+
+    :raise OSError: when the directory can't be listed
+    """
+    path = os.path.normpath(path)
+    mtime = os.stat(path).st_mtime_ns
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached and cached[0] > now and cached[1] == mtime:
+        return mtime, cached[2]
+
+    entries = {}
+    with os.scandir(path) as it:
+        for entry in it:
+            if is_upload_tmp(entry.name):
+                # Renamed over its target once complete.
+                continue
+            try:
+                if entry.is_dir():
+                    entries[entry.name] = Entry(True, 0, 0, entry.inode())
+                elif entry.is_file():
+                    stat = entry.stat()
+                    entries[entry.name] = Entry(
+                        False,
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                        entry.inode(),
+                    )
+            except OSError:
+                # Removed while scanning, the next scan will see it gone.
+                continue
+    with _cache_lock:
+        if len(_cache) >= CACHE_MAX_SIZE:
+            for key in [key for key, value in _cache.items() if value[0] <= now]:
+                del _cache[key]
+            if len(_cache) >= CACHE_MAX_SIZE:
+                _cache.clear()
+        _cache[path] = (now + CACHE_TTL, mtime, entries)
+    return mtime, entries
+
+
+def stat(path):
+    """Return the Entry of the path from the listing of its directory, or None.
+
+    The path is stat'ed itself when its directory can't be listed, a
+    directory may be traversable without being readable.
+    """
+    head, name = os.path.split(os.path.normpath(path))
+    if not name:
+        return _stat(path)
+    try:
+        return scan(head)[1].get(name)
+    except OSError:
+        return _stat(path)
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if S_ISDIR(st.st_mode):
+        return Entry(True, 0, 0, st.st_ino)
+    if S_ISREG(st.st_mode):
+        return Entry(False, st.st_size, st.st_mtime_ns, st.st_ino)
+    return None
+
+
+def invalidate(path):
+    """Drop the cached listing of the directory."""
+    with _cache_lock:
+        _cache.pop(os.path.normpath(path), None)
+
+
+def walk(root):
+    """Scan the tree under root, the directories of a level in parallel.
+
+    :return: dict mapping the path of every directory to its :func:`scan`
+    """
+    result = {}
+    level = [root]
+    while level:
+        next_level = []
+        for path, scanned in zip(level, SCAN_POOL.map(_try_scan, level)):
+            if scanned is None:
+                continue
+            result[path] = scanned
+            next_level += [
+                os.path.join(path, name)
+                for name, entry in scanned[1].items()
+                if entry.is_dir
+            ]
+        level = next_level
+    return result
+
+
+def _try_scan(path):
+    try:
+        return scan(path)
+    except OSError:
+        return None
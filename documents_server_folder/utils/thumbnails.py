@@ -0,0 +1,93 @@
+"""Thumbnails of the server folder images, made in the background.
+
+The thumbnails are cached on disk under the data directory, named after a
+hash of the path, mtime and size of the image, so that an unchanged file is
+decoded only once. An image that can't be processed gets an empty
+``.error`` file instead, so that it isn't retried either.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo.exceptions import UserError
+from odoo.tools import config, image_process
+
+from . import scanner
+
+_logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (200, 140)
+THUMBNAIL_WORKERS = 2
+
+THUMBNAIL_POOL = ThreadPoolExecutor(
+    max_workers=THUMBNAIL_WORKERS,
+    thread_name_prefix="dsf_thumbnail",
+)
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _cache_path(path):
+    entry = scanner.stat(path)
+    if not entry or entry.is_dir:
+        return None
+    key = hashlib.sha1(
+        f"{path}\0{entry.mtime_ns}\0{entry.size}".encode(errors="replace"),
+    ).hexdigest()
+    return os.path.join(config["data_dir"], "dsf_thumbnails", key[:2], key)
+
+
+def get(path):
+    """Return the status of the thumbnail of the image and its content.
+
+    A thumbnail that is not cached yet is queued for the pool and reported
+    as "pending".
+
+    :return: a (status, thumbnail) pair, status being "present", "pending"
+        or "error" and thumbnail the image bytes when present
+    """
+    cache_path = _cache_path(path)
+    if not cache_path:
+        return "error", None
+    try:
+        with open(cache_path, "rb") as f:
+            return "present", f.read()
+    except FileNotFoundError:
+        pass
+    if os.path.exists(cache_path + ".error"):
+        return "error", None
+    with _pending_lock:
+        if cache_path in _pending:
+            return "pending", None
+        _pending.add(cache_path)
+    THUMBNAIL_POOL.submit(_generate, path, cache_path)
+    return "pending", None
+
+
+def _generate(path, cache_path):
+    try:
+        try:
+            with open(path, "rb") as f:
+                data = image_process(f.read(), size=THUMBNAIL_SIZE, crop="center")
+            target = cache_path
+        except (UserError, TypeError, OSError, ValueError):
+            # Not an image Pillow can decode, or unreadable.
+            _logger.info("Thumbnail of %s failed", path, exc_info=True)
+            data = b""
+            target = cache_path + ".error"
+        directory = os.path.dirname(cache_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+    except OSError:
+        _logger.warning("Thumbnail of %s could not be cached", path, exc_info=True)
+    finally:
+        with _pending_lock:
+            _pending.discard(cache_path)
@@ -0,0 +1,76 @@
+"""Atomic, streamed writes of the uploaded files to the server folder.
+
+An upload is copied chunk by chunk to a hidden temporary file of the
+target directory and renamed over the target once complete, so that a
+crash never leaves a truncated file and the memory used doesn't depend on
+the size of the file. Werkzeug already spools large uploads to disk.
+"""
+
+import contextlib
+import os
+import re
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # bytes
+UPLOAD_WORKERS = 4
+
+# Name of the temporary files, hidden from the folder listings.
+UPLOAD_TMP_RE = re.compile(r"\..+\.[0-9a-f]{32}\.part")
+
+UPLOAD_POOL = ThreadPoolExecutor(
+    max_workers=UPLOAD_WORKERS,
+    thread_name_prefix="dsf_upload",
+)
+
+
+def upload_path(folder_path, file_name):
+    """Return the path of an uploaded file in the folder, without leaving it."""
+    path = os.path.join(folder_path, os.path.basename(file_name))
+    return os.path.normpath(os.path.normcase(path))
+
+
+def is_upload_tmp(name):
+    """Return whether the file name is the one of an upload in progress."""
+    return bool(UPLOAD_TMP_RE.fullmatch(name))
+
+
+def write_atomic(file, path, fsync=False):
+    """Stream the uploaded file to path through a temporary file.
+
+    :param file: werkzeug FileStorage of the upload
+    :param fsync: flush the file and the directory entry to the disk before
+        returning
+    """
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.part")
+    # The mode is subject to the umask, as for a plain open().
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(file.stream, f, UPLOAD_CHUNK_SIZE)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+    if fsync:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def write_many(files, paths, fsync=False):
+    """Write several uploads in parallel, raising the first error."""
+    futures = [
+        UPLOAD_POOL.submit(write_atomic, file, path, fsync)
+        for file, path in zip(files, paths)
+    ]
+    for future in futures:
+        future.result()
@@ -1,6 +1,6 @@
 {
     "name": "Weather",
-    "version": "1.0",
+    "version": "1.3",
     "summary": "Weather module",
     "author": "Ruslan Akunevich",
     "license": "LGPL-3",
@@ -12,6 +12,9 @@
         "security/ir.model.access.csv",
         "views/weather_views.xml",
         "data/rok_apps.xml",
+        "data/weather_place_data.xml",
+        "data/ir_config_parameter_data.xml",
+        "data/ir_cron_data.xml",
     ],
     "assets": {
         "web.assets_backend": [
@@ -6,14 +6,12 @@ API_WEATHER_INFO = "https://www.gismeteo.ru/weather-zhodino-11949/10-days/"
 API_WEATHER_LAT = "51.154876"
 API_WEATHER_LON = "17.037135"
 
-astro_api = (
-    "https://api.sunrise-sunset.org/json?lat={lat}&lng={lon}&formatted={formatted}"
-)
 find_places_prefix_api = (
     "https://www.meteosource.com/api/v1/free/find_places_prefix?text={text}&key={key}"
 )
 nearest_place_api = "https://www.meteosource.com/api/v1/free/nearest_place?lat={lat}&lon={lon}&key={key}"
 forecast_api = "https://www.meteosource.com/api/v1/free/point?place_id={place_id}&sections=all&timezone={timezone}&language=en&units=auto&key={key}"
+forecast_point_api = "https://www.meteosource.com/api/v1/free/point?lat={lat}&lon={lon}&sections=all&timezone={timezone}&language=en&units=auto&key={key}"
 
 CURRENT = "current"
 FORECASTED_HOURLY = "hourly"
@@ -24,3 +22,88 @@ EVENT_TYPE = [
     (FORECASTED_HOURLY, "Forecasted hourly"),
     (FORECASTED_DAILY, "Forecasted daily"),
 ]
+
+# Columns of a forecast series stored in a weather.snapshot payload.
+SERIES_FIELDS = (
+    "event",
+    "weather",
+    "icon",
+    "summary",
+    "temperature",
+    "temperature_min",
+    "temperature_max",
+    "wind_speed",
+    "wind_angle",
+    "wind_dir",
+    "prec_total",
+    "prec_type",
+    "cloud_cover",
+)
+
+# Forecast cache lifetimes in minutes, overridable with the ir.config_parameter
+# keys below. A snapshot younger than the fresh TTL is served as is, one younger
+# than the stale TTL is served while a background refresh is queued.
+FORECAST_FRESH_TTL_PARAM = "weather.forecast_fresh_ttl"
+FORECAST_STALE_TTL_PARAM = "weather.forecast_stale_ttl"
+FORECAST_FRESH_TTL = 120
+FORECAST_STALE_TTL = 24 * 60
+
+CACHE_FRESH = "fresh"
+CACHE_STALE = "stale"
+CACHE_FETCHED = "fetched"
+
+# First key of the PostgreSQL advisory lock taken while fetching the forecast
+# of a place, the second key is the weather.place id.
+FORECAST_FETCH_LOCK = 57460
+
+# Background prefetch of the most requested places, see
+# weather.snapshot._cron_prefetch_snapshots.
+PREFETCH_TOP_N_PARAM = "weather.prefetch_top_n"
+PREFETCH_TOP_N = 10
+PREFETCH_BUDGET_RESERVE = 0.25  # share of the daily budget kept for the users
+PREFETCH_INTERVAL = 5  # minutes, must match the cron interval
+PREFETCH_LEAD = 15  # minutes before the snapshot stops being fresh
+PREFETCH_WINDOW = 7  # days of request counters used for the ranking
+
+# Number of days of weather.astro rows computed at once for a place.
+ASTRO_PRECOMPUTE_DAYS = 366
+
+# Radius, in kilometers, within which a known place answers a coordinate lookup.
+PLACE_RADIUS_PARAM = "weather.place_radius_km"
+PLACE_RADIUS = 10
+
+# Days during which the upstream results of a place prefix search are reused.
+PREFIX_CACHE_TTL = 30
+PREFIX_MIN_LENGTH = 3
+PREFIX_MAX_RESULTS = 50
+
+# Retention of superseded snapshots, see weather.snapshot._cron_retention.
+SNAPSHOT_RETENTION_PARAM = "weather.snapshot_retention_days"
+SNAPSHOT_RETENTION = 7
+HISTORY_ROLLUP_PARAM = "weather.history_rollup"
+RETENTION_BATCH_SIZE = 1000
+
+# Maximum number of locations of a /weather/batch request.
+BATCH_MAX_LOCATIONS = 20
+
+# Threads running the upstream HTTP calls of a request concurrently.
+UPSTREAM_WORKERS = 8
+
+# Upstream HTTP client, see utils/meteosource.py.
+UPSTREAM_CONNECT_TIMEOUT = 3.05  # seconds
+UPSTREAM_READ_TIMEOUT = 10  # seconds
+UPSTREAM_RETRIES = 2
+UPSTREAM_BACKOFF = 0.5  # seconds, doubled on every retry, with jitter
+UPSTREAM_RETRY_STATUSES = (500, 502, 503, 504)
+UPSTREAM_MAX_RESPONSE_SIZE = 5 * 1024 * 1024  # bytes
+
+# Upstream quota governor, see weather.upstream.quota. The daily budget is
+# shared by all the endpoints of the key, each endpoint also has a token
+# bucket of (capacity, tokens refilled per minute).
+UPSTREAM_DAILY_BUDGET_PARAM = "weather.meteosource_daily_budget"
+UPSTREAM_DAILY_BUDGET = 400
+UPSTREAM_RATE_LIMITS = {
+    "find_places_prefix": (10, 10),
+    "nearest_place": (10, 10),
+    "point": (10, 10),
+}
@@ -1,30 +1,48 @@
-import json
+import logging
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from decimal import Decimal
+from datetime import datetime
+from typing import NamedTuple
 
-import requests
-from dateutil import tz
-
-from odoo import http
+from odoo import _, http
+from odoo.exceptions import AccessError
+from odoo.osv.expression import OR
+from odoo.tools import escape_psql
+from odoo.tools.lru import LRU
 
 from ..constants import (
     API_WEATHER_CR_URL,
     API_WEATHER_INFO,
-    API_WEATHER_KEY,
-    API_WEATHER_TZ,
-    CURRENT,
-    FORECASTED_DAILY,
-    FORECASTED_HOURLY,
-    astro_api,
-    find_places_prefix_api,
-    forecast_api,
-    nearest_place_api,
+    ASTRO_PRECOMPUTE_DAYS,
+    BATCH_MAX_LOCATIONS,
+    CACHE_FETCHED,
+    PREFIX_MAX_RESULTS,
+    PREFIX_MIN_LENGTH,
+)
+from ..exceptions import QuotaExceeded, WeatherError
+from ..utils.meteosource import (
+    UPSTREAM_POOL,
+    get_stats,
+    request_forecast,
+    request_nearest_place,
 )
 
+_logger = logging.getLogger(__name__)
+
+# Serialized /weather/data payloads of this worker, keyed by database and ETag.
+RESPONSE_CACHE = LRU(256)
+
 
-class WeatherError(Exception):
-    pass
+@contextmanager
+def timed(timings, phase):
+    """Add the duration of the block, in milliseconds, to the timing of the phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = (time.perf_counter() - start) * 1000
+        timings[phase] = timings.get(phase, 0) + duration
 
 
 class WeatherController(http.Controller):
@@ -34,81 +52,351 @@ class WeatherController(http.Controller):
         location: str | None = None,
         lat: str | None = None,
         lon: str | None = None,
+        etag: str | None = None,
     ) -> dict:
+        timings = {}
+        queries = http.request.env.cr.sql_log_count
         try:
-            ret = self.get_db_chart_data(location, lat, lon)
-            return {"result": "ok", "data": ret}
+            ret, cache, etag = self.get_db_chart_data(location, lat, lon, etag, timings)
+            if ret is None:
+                return {"result": "not_modified", "cache": cache, "etag": etag}
+            return {"result": "ok", "cache": cache, "etag": etag, "data": ret}
         except WeatherError as inst:
             proc, info = inst.args
             return {"result": "error", "procedure": proc, "info": info}
+        finally:
+            queries = http.request.env.cr.sql_log_count - queries
+            self.set_server_timing(timings, queries)
+
+    def get_db_chart_data(
+        self,
+        location: str,
+        lat: str,
+        lon: str,
+        etag: str | None = None,
+        timings: dict | None = None,
+    ) -> tuple[dict | None, str, str]:
+        """Return the payload of the place, its cache status and its ETag.
+
+        The ETag only depends on the place, the snapshot and the date, so a
+        matching one is answered without reading the forecast (the payload
+        is then None), and the payloads are cached under it.
 
-    def get_db_chart_data(self, location: str, lat: str, lon: str) -> dict:
-        place = self.get_place(location, lat, lon)
-        lifetime = datetime.now() - timedelta(hours=2)
+        :param timings: filled with the duration of each phase, in ms
+        """
+        timings = {} if timings is None else timings
         env = http.request.env
-        forecast = env["weather.forecast"].search(
-            [("place_id", "=", place.id), ("fixed", ">", lifetime)],
-            order="event",
+        snapshot = None
+        with timed(timings, "place"):
+            if location or not lat or not lon:
+                place = self.get_place(location, lat, lon)
+            else:
+                lat, lon = self.parse_coordinates(lat, lon)
+                place = env["weather.place"]._find_nearest(lat, lon)
+        if not place:
+            with timed(timings, "upstream"):
+                place, snapshot = self.get_place_and_forecast(lat, lon)
+            cache = CACHE_FETCHED
+        env["weather.request.counter"].sudo()._count_request(place)
+        if not snapshot:
+            with timed(timings, "forecast"):
+                snapshot, cache = env["weather.snapshot"]._get_cached(place)
+        with timed(timings, "payload"):
+            data, etag = self.get_payload(place, snapshot, etag)
+        return data, cache, etag
+
+    def get_place_and_forecast(self, lat: float, lon: float):
+        """Resolve unknown coordinates and fetch their forecast at the same time.
+
+        Both upstream calls only need the coordinates, so they run on the
+        upstream pool together. The forecast is only stored when the place
+        is new, a known place is served from its own snapshots, under the
+        coalescing lock, like any other.
+
+        :return: the place and its new snapshot, or None
+        """
+        env = http.request.env
+        Quota = env["weather.upstream.quota"].sudo()
+        Quota._acquire("nearest_place", "get_place")
+        Quota._acquire("point", "get_forecast_api_data")
+        place_future = UPSTREAM_POOL.submit(request_nearest_place, lat, lon)
+        forecast_future = UPSTREAM_POOL.submit(request_forecast, lat=lat, lon=lon)
+        ret = place_future.result()
+        place = env["weather.place"].search(
+            [("place_id", "=", ret["place_id"])],
+            limit=1,
         )
-        astro = self.get_astro(place)
-        if not len(forecast):
-            self.get_forecast_api_data(place)
-            forecast = env["weather.forecast"].search(
-                [("place_id", "=", place.id), ("fixed", ">", lifetime)],
-                order="event",
+        if place:
+            place._add_alias(lat, lon)
+            return place, None
+        place = self.create_place(ret, "")
+        place._add_alias(lat, lon)
+        snapshot = env["weather.snapshot"]._create_from_api(
+            place,
+            forecast_future.result(),
+        )
+        return place, snapshot
+
+    def set_server_timing(self, timings: dict, queries: int | None = None) -> None:
+        """Report the phase durations in the Server-Timing response header.
+
+        :param queries: number of SQL statements of the request, reported
+            as the description of a ``sql`` metric
+        """
+        if not timings:
+            return
+        _logger.debug("Weather request timings: %s, queries: %s", timings, queries)
+        metrics = [f"{phase};dur={duration:.1f}" for phase, duration in timings.items()]
+        if queries is not None:
+            metrics.append(f'sql;desc="{queries}"')
+        http.request.future_response.headers["Server-Timing"] = ", ".join(metrics)
+
+    def get_payload(self, place, snapshot, etag=None, astro=None):
+        """Return the cached or newly built payload of the snapshot and its ETag."""
+        date = datetime.now().date()
+        current_etag = f'"{place.id}-{snapshot.fixed:%Y%m%d%H%M}-{date:%Y%m%d}"'
+        if etag == current_etag:
+            return None, current_etag
+        key = (http.request.env.cr.dbname, current_etag)
+        data = RESPONSE_CACHE.get(key)
+        if data is None:
+            astro = astro or self.get_astro(place)
+            data = self.get_forecast_data(place, snapshot, astro)
+            RESPONSE_CACHE[key] = data
+        return data, current_etag
+
+    @http.route("/weather/batch", type="json", auth="public", methods=["POST"])
+    def get_weather_batch(self, locations: list | None = None) -> dict:
+        """Return the weather of several places in a single response.
+
+        :param locations: list of at most ``BATCH_MAX_LOCATIONS`` dicts with
+            a ``location`` or ``lat`` and ``lon`` keys, and an optional
+            ``etag``
+        :return: one result per location, in the same order, shaped like
+            the /weather/data responses
+        """
+        if not isinstance(locations, list) or len(locations) > BATCH_MAX_LOCATIONS:
+            method_name = "get_weather_batch"
+            return {
+                "result": "error",
+                "procedure": method_name,
+                "info": f"Expected a list of at most {BATCH_MAX_LOCATIONS} locations.",
+            }
+        env = http.request.env
+        places = self.get_place_batch(locations)
+        resolved = env["weather.place"].union(
+            *(place for place in places if not isinstance(place, WeatherError)),
+        )
+        env["weather.request.counter"].sudo()._count_request(resolved)
+        cached = env["weather.snapshot"]._get_cached_many(resolved)
+        astros = self.get_astro_batch(resolved)
+        results = []
+        for item, place in zip(locations, places):
+            try:
+                if isinstance(place, WeatherError):
+                    raise place
+                if isinstance(cached[place.id], WeatherError):
+                    raise cached[place.id]
+                snapshot, cache = cached[place.id]
+                data, etag = self.get_payload(
+                    place,
+                    snapshot,
+                    item.get("etag"),
+                    astros.get(place.id),
+                )
+                if data is None:
+                    results.append(
+                        {"result": "not_modified", "cache": cache, "etag": etag},
+                    )
+                else:
+                    results.append(
+                        {"result": "ok", "cache": cache, "etag": etag, "data": data},
+                    )
+            except WeatherError as inst:
+                proc, info = inst.args
+                results.append({"result": "error", "procedure": proc, "info": info})
+        return {"result": "ok", "data": results}
+
+    def parse_batch_item(self, item) -> tuple[str | None, tuple[float, float] | None]:
+        """Return the stripped location, or else the coordinates, of a batch item."""
+        method_name = "get_weather_batch"
+        if not isinstance(item, dict):
+            raise WeatherError(method_name, f"Wrong location: {item!r}")
+        location = item.get("location")
+        if location and not isinstance(location, str):
+            raise WeatherError(method_name, f"Wrong location: {location!r}")
+        if location and location.strip():
+            return location.strip(), None
+        if not item.get("lat") or not item.get("lon"):
+            method_name = "get_place"
+            raise WeatherError(
+                method_name,
+                'Empty parameters "location", "lat", "lon".',
+            )
+        return None, self.parse_coordinates(item["lat"], item["lon"])
+
+    def get_place_batch(self, locations: list) -> list:
+        """Resolve the places of a batch.
+
+        Known names and coordinates are found with one query each, the
+        upstream lookups of the others run concurrently on the upstream
+        pool, then the new places are stored with the request cursor.
+
+        :return: a place or a WeatherError per location
+        """
+        env = http.request.env
+        Place = env["weather.place"]
+        parsed = []
+        for item in locations:
+            try:
+                parsed.append(self.parse_batch_item(item))
+            except WeatherError as inst:
+                parsed.append(inst)
+        valid = [item for item in parsed if not isinstance(item, WeatherError)]
+
+        names = {location.lower() for location, _coordinates in valid if location}
+        by_name = {}
+        if names:
+            domain = OR(
+                [
+                    [
+                        "|",
+                        ("name", "=ilike", escape_psql(name)),
+                        ("search_name", "=ilike", escape_psql(name)),
+                    ]
+                    for name in names
+                ],
             )
-        return self.get_forecast_data(place, forecast, astro)
+            for place in Place.search(domain):
+                for name in (place.name, place.search_name):
+                    if name:
+                        by_name.setdefault(name.lower(), place)
+        coordinates = list(
+            {coordinates for location, coordinates in valid if not location},
+        )
+        nearest = dict(zip(coordinates, Place._find_nearest_many(coordinates)))
+
+        Quota = env["weather.upstream.quota"].sudo()
+        nearby = {}
+        for point in coordinates:
+            if nearest[point]:
+                continue
+            try:
+                Quota._acquire("nearest_place", "get_place")
+            except QuotaExceeded as inst:
+                nearby[point] = inst
+                continue
+            nearby[point] = UPSTREAM_POOL.submit(request_nearest_place, *point)
+        searches = env["weather.prefix.cache"]._lookup_many(
+            {
+                location
+                for location, _coordinates in valid
+                if location and location.lower() not in by_name
+            },
+        )
+
+        places = []
+        for item in parsed:
+            try:
+                if isinstance(item, WeatherError):
+                    raise item
+                location, point = item
+                if location:
+                    place = by_name.get(location.lower())
+                    if not place:
+                        if isinstance(searches[location], WeatherError):
+                            raise searches[location]
+                        place = self.create_searched_place(searches[location], location)
+                        by_name[location.lower()] = place
+                else:
+                    place = nearest[point]
+                    if not place:
+                        if isinstance(nearby[point], WeatherError):
+                            raise nearby[point]
+                        place = self.create_place(nearby[point].result(), "")
+                        place._add_alias(*point)
+                        nearest[point] = place
+                places.append(place)
+            except WeatherError as inst:
+                places.append(inst)
+        return places
+
+    @http.route("/weather/places", type="json", auth="public", methods=["POST"])
+    def get_places(self, prefix: str = "", limit: int = 10) -> dict:
+        """Return the candidate places for a type-ahead prefix.
+
+        Known places are answered from the database, the upstream search
+        is only used, and cached, when none of them matches.
+        """
+        env = http.request.env
+        prefix = (prefix or "").strip()
+        try:
+            limit = max(1, min(int(limit), PREFIX_MAX_RESULTS))
+        except (TypeError, ValueError):
+            method_name = "get_places"
+            return {
+                "result": "error",
+                "procedure": method_name,
+                "info": f"Wrong limit: {limit}",
+            }
+        if len(prefix) < PREFIX_MIN_LENGTH:
+            return {"result": "ok", "data": []}
+        places = env["weather.place"]._search_prefix(prefix, limit)
+        data = [
+            {
+                "id": place.id,
+                "place_id": place.place_id,
+                "name": place.name,
+                "adm_area1": place.adm_area1,
+                "country": place.country,
+                "source": "local",
+            }
+            for place in places
+        ]
+        if not data:
+            try:
+                results = env["weather.prefix.cache"]._lookup(prefix)
+            except WeatherError as inst:
+                proc, info = inst.args
+                return {"result": "error", "procedure": proc, "info": info}
+            data = [
+                {
+                    "id": False,
+                    "place_id": x.get("place_id"),
+                    "name": x.get("name"),
+                    "adm_area1": x.get("adm_area1"),
+                    "country": x.get("country"),
+                    "source": "upstream",
+                }
+                for x in results[:limit]
+            ]
+        return {"result": "ok", "data": data}
+
+    @http.route("/weather/metrics", type="json", auth="user", methods=["POST"])
+    def get_metrics(self) -> dict:
+        env = http.request.env
+        if not env.user.has_group("base.group_system"):
+            raise AccessError(_("Only administrators can read the weather metrics."))
+        return {
+            "tables": env["weather.snapshot"].sudo()._get_table_metrics(),
+            "upstream": get_stats(),
+        }
 
     def get_place(self, location: str, lat: str, lon: str):
         env = http.request.env
         if location:
-            place = env["weather.place"].search([("name", "=", location)], limit=1)
+            place = env["weather.place"].search(
+                [
+                    "|",
+                    ("name", "=ilike", escape_psql(location)),
+                    ("search_name", "=ilike", escape_psql(location)),
+                ],
+                limit=1,
+            )
             if place:
                 return place
-            headers = {"accept": "application/json"}
-            token = API_WEATHER_KEY
-            url = find_places_prefix_api.replace("{text}", location).replace(
-                "{key}",
-                token,
-            )
-            resp = requests.get(url, headers=headers)
-            if resp.status_code != 200:
-                method_name = "get_place"
-                raise WeatherError(
-                    method_name,
-                    f"(1) Bad response status code: {resp.status_code}",
-                )
-            ret = json.loads(resp.content)
-            if isinstance(ret, list):
-                if len(ret) > 1:
-                    tmp = [
-                        x
-                        for x in ret
-                        if x["country"] in ("Republic of Belarus", "Poland")
-                    ]
-                    if len(tmp) > 0:
-                        ret = tmp[0]
-            if isinstance(ret, list) and len(ret) > 0:
-                ret = ret[0]
-            if not isinstance(ret, dict):
-                method_name = "get_place"
-                raise WeatherError(method_name, f"Wrong type of response data: {ret}")
-            return env["weather.place"].create(
-                {
-                    "place_id": ret["place_id"],
-                    "name": ret["name"],
-                    "adm_area1": ret["adm_area1"],
-                    "adm_area2": ret["adm_area2"] if ret["adm_area2"] else "",
-                    "country": ret["country"],
-                    "lat": ret["lat"],
-                    "lon": ret["lon"],
-                    "timezone": ret["timezone"],
-                    "type": ret["type"],
-                    "search_name": location,
-                    "lat_cut": "",
-                    "lon_cut": "",
-                },
-            )
+            ret = env["weather.prefix.cache"]._lookup(location)
+            return self.create_searched_place(ret, location)
 
         if not lat or not lon:
             method_name = "get_place"
@@ -117,25 +405,42 @@ class WeatherController(http.Controller):
                 'Empty parameters "location", "lat", "lon".',
             )
 
-        lat_cut = str(lat)[:5] + "00000"
-        lon_cut = str(lon)[:5] + "00000"
+        lat, lon = self.parse_coordinates(lat, lon)
+        place = env["weather.place"]._find_nearest(lat, lon)
+        if place:
+            return place
+        env["weather.upstream.quota"].sudo()._acquire("nearest_place", "get_place")
+        place = self.create_place(request_nearest_place(lat, lon), "")
+        place._add_alias(lat, lon)
+        return place
+
+    def create_searched_place(self, ret: list, location: str):
+        """Return the place of the best match of a Meteosource place search."""
+        if len(ret) > 1:
+            tmp = [x for x in ret if x["country"] in ("Republic of Belarus", "Poland")]
+            if len(tmp) > 0:
+                ret = tmp
+        if not ret or not isinstance(ret[0], dict):
+            method_name = "get_place"
+            raise WeatherError(method_name, f"Wrong type of response data: {ret}")
+        return self.create_place(ret[0], location)
+
+    def parse_coordinates(self, lat, lon) -> tuple[float, float]:
+        try:
+            return float(lat), float(lon)
+        except (TypeError, ValueError) as ex:
+            method_name = "get_place"
+            raise WeatherError(method_name, f"Wrong coordinates: {lat}, {lon}") from ex
+
+    def create_place(self, ret: dict, search_name: str):
+        """Return the place of a Meteosource place record, creating it if needed."""
+        env = http.request.env
         place = env["weather.place"].search(
-            [("lat_cut", "=", lat_cut), ("lon_cut", "=", lon_cut)],
+            [("place_id", "=", ret["place_id"])],
             limit=1,
         )
         if place:
             return place
-        headers = {"accept": "application/json"}
-        token = API_WEATHER_KEY
-        url = nearest_place_api.format(lat=str(lat), lon=str(lon), key=token)
-        resp = requests.get(url, headers=headers)
-        if resp.status_code != 200:
-            method_name = "get_place"
-            raise WeatherError(
-                method_name,
-                f"(2) Bad response status code: {resp.status_code}",
-            )
-        ret = json.loads(resp.content)
         return env["weather.place"].create(
             {
                 "place_id": ret["place_id"],
@@ -147,9 +452,7 @@ class WeatherController(http.Controller):
                 "lon": ret["lon"],
                 "timezone": ret["timezone"],
                 "type": ret["type"],
-                "search_name": "",
-                "lat_cut": lat_cut,
-                "lon_cut": lon_cut,
+                "search_name": search_name,
             },
         )
 
@@ -162,312 +465,111 @@ class WeatherController(http.Controller):
         )
         if astro:
             return astro
-        headers = {"accept": "application/json"}
-        url = (
-            astro_api.replace("{lat}", str(place.lat))
-            .replace("{lon}", str(place.lon))
-            .replace("{formatted}", "0")
-        )
-        resp = requests.get(url, headers=headers)
-        if resp.status_code != 200:
-            method_name = "get_astro"
-            raise WeatherError(
-                method_name,
-                f"(2) Bad response status code: {resp.status_code}",
-            )
-        ret = json.loads(resp.content)
-        if ret["status"] != "OK":
-            method_name = "get_astro"
-            raise WeatherError(method_name, f"(2) Bad status in API data: {ret}")
-
-        sunrise = self.get_datetime_value(ret, "sunrise", place.timezone)
-        sunset = self.get_datetime_value(ret, "sunset", place.timezone)
-        solar_noon = self.get_datetime_value(ret, "solar_noon", place.timezone)
-        civil_twilight_begin = self.get_datetime_value(
-            ret,
-            "civil_twilight_begin",
-            place.timezone,
-        )
-        civil_twilight_end = self.get_datetime_value(
-            ret,
-            "civil_twilight_end",
-            place.timezone,
-        )
-        nautical_twilight_begin = self.get_datetime_value(
-            ret,
-            "nautical_twilight_begin",
-            place.timezone,
-        )
-        nautical_twilight_end = self.get_datetime_value(
-            ret,
-            "nautical_twilight_end",
-            place.timezone,
-        )
-        astronomical_twilight_begin = self.get_datetime_value(
-            ret,
-            "astronomical_twilight_begin",
-            place.timezone,
-        )
-        astronomical_twilight_end = self.get_datetime_value(
-            ret,
-            "astronomical_twilight_end",
-            place.timezone,
-        )
+        astro = env["weather.astro"]._precompute(place, date, ASTRO_PRECOMPUTE_DAYS)
+        return astro.filtered(lambda x: x.date == date)
 
-        return env["weather.astro"].create(
-            {
-                "place_id": place.id,
-                "date": date,
-                "day_length": ret["results"]["day_length"],
-                "sunrise": sunrise,
-                "sunset": sunset,
-                "solar_noon": solar_noon,
-                "civil_twilight_begin": civil_twilight_begin,
-                "civil_twilight_end": civil_twilight_end,
-                "nautical_twilight_begin": nautical_twilight_begin,
-                "nautical_twilight_end": nautical_twilight_end,
-                "astronomical_twilight_begin": astronomical_twilight_begin,
-                "astronomical_twilight_end": astronomical_twilight_end,
-            },
-        )
-
-    def get_datetime_value(
-        self,
-        data: dict,
-        field_name: str,
-        timezone: str,
-    ) -> datetime:
-        value = data["results"][field_name]
-        if "+" in value:
-            tz_part = value.split("+")[1]
-            if tz_part != "00:00":
-                method_name = "get_datetime_value"
-                error_msg = f"Expected datetime value with timezone 00:00. Got: {value}"
-                raise WeatherError(method_name, error_msg)
-            utc = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
-            to_zone = tz.gettz(timezone)
-            local = utc.astimezone(to_zone)
-            s_local = local.strftime("%Y-%m-%dT%H:%M:%S")
-            return datetime.strptime(s_local, "%Y-%m-%dT%H:%M:%S")
-        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
-
-    def get_forecast_api_data(self, place) -> None:
+    def get_astro_batch(self, places) -> dict:
+        """Return today's astro row of every place, keyed by place id."""
+        date = datetime.now().date()
         env = http.request.env
-        headers = {"accept": "application/json"}
-        token = API_WEATHER_KEY
-        timezone = API_WEATHER_TZ
-        url = (
-            forecast_api.replace("{place_id}", place.place_id)
-            .replace("{timezone}", timezone)
-            .replace("{key}", token)
+        astros = env["weather.astro"].search(
+            [("place_id", "in", places.ids), ("date", "=", date)],
         )
-        resp = requests.get(url, headers=headers)
-        if resp.status_code != 200:
-            method_name = "get_forecast_api_data"
-            raise WeatherError(
-                method_name,
-                f"Bad response status code: {resp.status_code}",
-            )
-        ret = json.loads(resp.content)
-        fixed = datetime.now().replace(second=0, microsecond=0)
-        try:
-            weather = env["weather.forecast"].create(
-                {
-                    "place_id": place.id,
-                    "event": fixed,
-                    "fixed": fixed,
-                    "ev_type": CURRENT,
-                    "lat": ret["lat"],
-                    "lon": ret["lon"],
-                    "elevation": ret["elevation"],
-                    "timezone": ret["timezone"],
-                    "units": ret["units"],
-                    "weather": ret["current"]["icon"],
-                    "icon": ret["current"]["icon_num"],
-                    "summary": ret["current"]["summary"],
-                    "temperature": ret["current"]["temperature"],
-                    "wind_speed": ret["current"]["wind"]["speed"],
-                    "wind_angle": ret["current"]["wind"]["angle"],
-                    "wind_dir": ret["current"]["wind"]["dir"],
-                    "prec_total": ret["current"]["precipitation"]["total"],
-                    "prec_type": ret["current"]["precipitation"]["type"],
-                    "cloud_cover": ret["current"]["cloud_cover"],
-                },
-            )
-            for hour in ret["hourly"]["data"]:
-                env["weather.forecast"].create(
-                    {
-                        "place_id": place.id,
-                        "event": datetime.strptime(hour["date"], "%Y-%m-%dT%H:%M:%S"),
-                        "fixed": fixed,
-                        "ev_type": FORECASTED_HOURLY,
-                        "lat": ret["lat"],
-                        "lon": ret["lon"],
-                        "elevation": weather.elevation,
-                        "timezone": weather.timezone,
-                        "units": weather.units,
-                        "weather": hour["weather"],
-                        "icon": hour["icon"],
-                        "summary": hour["summary"],
-                        "temperature": hour["temperature"],
-                        "temperature_min": None,
-                        "temperature_max": None,
-                        "wind_speed": hour["wind"]["speed"],
-                        "wind_angle": hour["wind"]["angle"],
-                        "wind_dir": hour["wind"]["dir"],
-                        "prec_total": hour["precipitation"]["total"],
-                        "prec_type": hour["precipitation"]["type"],
-                        "cloud_cover": hour["cloud_cover"]["total"],
-                    },
-                )
+        result = {astro.place_id.id: astro for astro in astros}
+        for place in places:
+            if place.id not in result:
+                try:
+                    result[place.id] = self.get_astro(place)
+                except WeatherError:
+                    continue
+        return result
 
-            for day in ret["daily"]["data"]:
-                env["weather.forecast"].create(
-                    {
-                        "place_id": place.id,
-                        "event": datetime.strptime(day["day"], "%Y-%m-%d"),
-                        "fixed": fixed,
-                        "ev_type": FORECASTED_DAILY,
-                        "lat": ret["lat"],
-                        "lon": ret["lon"],
-                        "elevation": weather.elevation,
-                        "timezone": weather.timezone,
-                        "units": weather.units,
-                        "weather": day["weather"],
-                        "icon": day["icon"],
-                        "summary": day["summary"],
-                        "temperature": day["all_day"]["temperature"],
-                        "temperature_min": day["all_day"]["temperature_min"],
-                        "temperature_max": day["all_day"]["temperature_max"],
-                        "wind_speed": day["all_day"]["wind"]["speed"],
-                        "wind_angle": day["all_day"]["wind"]["angle"],
-                        "wind_dir": day["all_day"]["wind"]["dir"],
-                        "prec_total": day["all_day"]["precipitation"]["total"],
-                        "prec_type": day["all_day"]["precipitation"]["type"],
-                        "cloud_cover": day["all_day"]["cloud_cover"]["total"],
-                    },
-                )
-        except (KeyError, ValueError, TypeError) as ex:
-            method_name = "get_forecast_api_data"
-            raise WeatherError(method_name, f"Exception: {ex!s}, {ret=}") from ex
-
-    def get_forecast_data(self, place, forecast, astro) -> dict:
-        currents = forecast.filtered(lambda x: x.ev_type == CURRENT)
-        for_day = forecast.filtered(lambda x: x.ev_type == FORECASTED_HOURLY)
-        for_week = forecast.filtered(lambda x: x.ev_type == FORECASTED_DAILY)
-        if not len(currents):
+    def get_forecast_data(self, place, snapshot, astro) -> dict:
+        """Build the payload of the snapshot, one column of the series at a time."""
+        currents = DayWeather.from_series(snapshot.current or {})
+        if not currents:
             method_name = "get_forecast_data"
-            raise WeatherError(method_name, "Empty forecast Queryset.")
-        if not astro.sunrise or not astro.sunset:
+            raise WeatherError(method_name, "Empty forecast snapshot.")
+        sunrise, sunset = astro._get_daylight() if astro else (None, None)
+        if not sunrise or not sunset:
             method_name = "get_forecast_data"
             raise WeatherError(method_name, "Empty AstroData values.")
-        current = DayWeather(
-            event=currents[0].event,
-            state=currents[0].weather,
-            summary=currents[0].summary,
-            icon_num=currents[0].icon,
-            temperature=currents[0].temperature,
-            temperature_min=currents[0].temperature_min,
-            temperature_max=currents[0].temperature_max,
-            wind_speed=currents[0].wind_speed,
-            wind_dir=currents[0].wind_dir,
-            wind_angle=currents[0].wind_angle,
-            cloud_cover=currents[0].cloud_cover,
-            prec_total=currents[0].prec_total,
-            prec_type=currents[0].prec_type,
-        )
         data = PeriodWeather(
-            lat=currents[0].lat,
-            lon=currents[0].lon,
+            lat=snapshot.lat,
+            lon=snapshot.lon,
             place=place.name,
-            sunrise=astro.sunrise,
-            sunset=astro.sunset,
-            elevation=currents[0].elevation,
-            timezone=currents[0].timezone,
-            units=currents[0].units,
+            sunrise=sunrise,
+            sunset=sunset,
+            elevation=snapshot.elevation,
+            timezone=snapshot.timezone,
+            units=snapshot.units,
             cr_url=API_WEATHER_CR_URL,
-            # cr_info=f'forecast_len={len(forecast)}, currents_len={len(currents)}, for_day_len={len(for_day)}, for_week_len={len(for_week)}, {debug_info}',
             cr_info=API_WEATHER_INFO,
-            current=current,
+            current=currents[0],
+            for_day=DayWeather.from_series(snapshot.hourly or {}),
+            for_week=DayWeather.from_series(snapshot.daily or {}),
         )
-        for x in for_day:
-            data.for_day.append(
-                DayWeather(
-                    event=x.event,
-                    state=x.weather,
-                    summary=x.summary,
-                    icon_num=x.icon,
-                    temperature=x.temperature,
-                    temperature_min=x.temperature_min,
-                    temperature_max=x.temperature_max,
-                    wind_speed=x.wind_speed,
-                    wind_dir=x.wind_dir,
-                    wind_angle=x.wind_angle,
-                    cloud_cover=x.cloud_cover,
-                    prec_total=x.prec_total,
-                    prec_type=x.prec_type,
-                ),
-            )
-        for x in for_week:
-            data.for_week.append(
-                DayWeather(
-                    event=x.event,
-                    state=x.weather,
-                    summary=x.summary,
-                    icon_num=x.icon,
-                    temperature=x.temperature,
-                    temperature_min=x.temperature_min,
-                    temperature_max=x.temperature_max,
-                    wind_speed=x.wind_speed,
-                    wind_dir=x.wind_dir,
-                    wind_angle=x.wind_angle,
-                    cloud_cover=x.cloud_cover,
-                    prec_total=x.prec_total,
-                    prec_type=x.prec_type,
-                ),
-            )
         return data.to_json()
 
 
-@dataclass
-class DayWeather:
-    event: datetime
+class DayWeather(NamedTuple):
+    """One point of a forecast series, with its values formatted for the payload."""
+
+    event: str
     state: str
     summary: str
     icon_num: int
-    temperature: Decimal
-    temperature_min: Decimal | None
-    temperature_max: Decimal | None
-    wind_speed: Decimal
+    temperature: str | None
+    temperature_min: str | None
+    temperature_max: str | None
+    wind_speed: str | None
     wind_dir: str
     wind_angle: int
     cloud_cover: int
-    prec_total: Decimal
+    prec_total: str | None
     prec_type: str
 
+    @classmethod
+    def from_series(cls, series: dict) -> list["DayWeather"]:
+        """Return the points of a columnar series of weather.snapshot."""
+        size = len(series.get("event") or [])
+
+        def column(name):
+            return series.get(name) or [None] * size
+
+        def decimals(name):
+            # Migrated series may hold nulls.
+            return [
+                f"{value:.1f}" if value is not None else None for value in column(name)
+            ]
+
+        def optional_decimals(name):
+            return [f"{value:.1f}" if value else None for value in column(name)]
+
+        return list(
+            map(
+                cls,
+                [event[:19] for event in column("event")],
+                column("weather"),
+                column("summary"),
+                column("icon"),
+                decimals("temperature"),
+                optional_decimals("temperature_min"),
+                optional_decimals("temperature_max"),
+                decimals("wind_speed"),
+                column("wind_dir"),
+                column("wind_angle"),
+                column("cloud_cover"),
+                decimals("prec_total"),
+                column("prec_type"),
+            ),
+        )
+
     def to_json(self):
-        return {
-            "event": self.event.strftime("%Y-%m-%dT%H:%M:%S"),
-            "state": self.state,
-            "summary": self.summary,
-            "icon_num": self.icon_num,
-            "temperature": f"{self.temperature:.1f}",
-            "temperature_min": f"{self.temperature_min:.1f}"
-            if self.temperature_min
-            else None,
-            "temperature_max": f"{self.temperature_max:.1f}"
-            if self.temperature_max
-            else None,
-            "wind_speed": f"{self.wind_speed:.1f}",
-            "wind_dir": self.wind_dir,
-            "wind_angle": self.wind_angle,
-            "cloud_cover": self.cloud_cover,
-            "prec_total": f"{self.prec_total:.1f}",
-            "prec_type": self.prec_type,
-        }
+        return self._asdict()
 
 
-@dataclass
+@dataclass(slots=True)
 class PeriodWeather:
     lat: str
     lon: str
@@ -496,6 +598,6 @@ class PeriodWeather:
             "sunrise": self.sunrise.strftime("%Y-%m-%d %H:%M"),
             "sunset": self.sunset.strftime("%Y-%m-%d %H:%M"),
             "current": self.current.to_json(),
-            "for_day": [x.to_json() for x in self.for_day],
-            "for_week": [x.to_json() for x in self.for_week],
+            "for_day": [x._asdict() for x in self.for_day],
+            "for_week": [x._asdict() for x in self.for_week],
         }
@@ -0,0 +1,6 @@
+class WeatherError(Exception):
+    """Raised with ``(procedure, info)`` arguments when weather data can't be served."""
+
+
+class QuotaExceeded(WeatherError):
+    """Raised instead of calling Meteosource when its quota is spent."""
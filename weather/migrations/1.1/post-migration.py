@@ -0,0 +1,75 @@
+from odoo import SUPERUSER_ID
+
+from odoo.addons.weather.constants import (
+    CURRENT,
+    FORECASTED_DAILY,
+    FORECASTED_HOURLY,
+    SERIES_FIELDS,
+)
+
+
+def _first(column):
+    """SQL aggregate of the value of the first event of the fetch."""
+    return f"(array_agg({column} ORDER BY event))[1]"
+
+
+def _series(ev_type):
+    """SQL aggregate packing the rows of the event type into a columnar series."""
+    values = {name: name for name in SERIES_FIELDS}
+    values["event"] = """to_char(event, 'YYYY-MM-DD"T"HH24:MI:SS')"""
+    columns = ", ".join(
+        f"""
+        '{name}', COALESCE(
+            jsonb_agg({value} ORDER BY event) FILTER (WHERE ev_type = '{ev_type}'),
+            '[]'::jsonb
+        )
+        """
+        for name, value in values.items()
+    )
+    return f"jsonb_build_object({columns})"
+
+
+def migrate(cr, version):
+    """Pack the legacy row-per-event forecasts into weather.snapshot payloads.
+
+    The rows are grouped by fetch in the database, the legacy table may be
+    far too large to be read in memory.
+    """
+    cr.execute(
+        """
+        SELECT 1
+        FROM information_schema.tables
+        WHERE table_name = 'weather_forecast_legacy'
+        """,
+    )
+    if not cr.fetchone():
+        return
+
+    cr.execute(
+        f"""
+        INSERT INTO weather_snapshot (
+            place_id, fixed, lat, lon, elevation, timezone, units,
+            current, hourly, daily,
+            create_uid, create_date, write_uid, write_date
+        )
+        SELECT
+            place_id,
+            fixed,
+            {_first("lat")},
+            {_first("lon")},
+            {_first("elevation")},
+            {_first("timezone")},
+            {_first("units")},
+            {_series(CURRENT)},
+            {_series(FORECASTED_HOURLY)},
+            {_series(FORECASTED_DAILY)},
+            %(uid)s,
+            now() AT TIME ZONE 'UTC',
+            %(uid)s,
+            now() AT TIME ZONE 'UTC'
+        FROM weather_forecast_legacy
+        GROUP BY place_id, fixed
+        """,
+        {"uid": SUPERUSER_ID},
+    )
+    cr.execute("DROP TABLE weather_forecast_legacy")
@@ -0,0 +1,12 @@
+def migrate(cr, version):
+    """Keep the old weather_forecast table aside, the model becomes a SQL view."""
+    cr.execute(
+        """
+        SELECT 1
+        FROM information_schema.tables
+        WHERE table_name = 'weather_forecast'
+            AND table_type = 'BASE TABLE'
+        """,
+    )
+    if cr.fetchone():
+        cr.execute("ALTER TABLE weather_forecast RENAME TO weather_forecast_legacy")
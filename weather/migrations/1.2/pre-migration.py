@@ -0,0 +1,34 @@
+COORDINATE = r"^[-+]?[0-9]+(\.[0-9]+)?[NSEWnsew]?$"
+
+
+def _to_float(column):
+    """SQL expression parsing a "53.9N" / "27.56E" / "-12.3" coordinate."""
+    return f"""
+        (CASE WHEN upper(right(trim({column}), 1)) IN ('S', 'W') THEN -1 ELSE 1 END
+            * rtrim(trim({column}), 'NSEWnsew')::double precision)
+    """
+
+
+def migrate(cr, version):
+    """Backfill the numeric coordinates of the known places.
+
+    The columns are filled here so that the ORM doesn't recompute them
+    record by record when the fields are added.
+    """
+    cr.execute(
+        """
+        ALTER TABLE weather_place
+            ADD COLUMN IF NOT EXISTS latitude double precision,
+            ADD COLUMN IF NOT EXISTS longitude double precision
+        """,
+    )
+    cr.execute(
+        f"""
+        UPDATE weather_place
+        SET latitude = {_to_float("lat")},
+            longitude = {_to_float("lon")}
+        WHERE trim(lat) ~ %(coordinate)s
+            AND trim(lon) ~ %(coordinate)s
+        """,
+        {"coordinate": COORDINATE},
+    )
@@ -0,0 +1,17 @@
+def migrate(cr, version):
+    """Bind the London place seeded by the former web_search_read to its xmlid.
+
+    The place then stands for the record of data/weather_place_data.xml
+    instead of being created twice.
+    """
+    cr.execute(
+        """
+        INSERT INTO ir_model_data (module, name, model, res_id, noupdate)
+        SELECT 'weather', 'place_london', 'weather.place', id, true
+        FROM weather_place
+        WHERE place_id = 'london'
+        ORDER BY id
+        LIMIT 1
+        ON CONFLICT DO NOTHING
+        """,
+    )
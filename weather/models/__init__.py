@@ -1 +1,12 @@
-from . import astro, forecast, place
+from . import (
+    astro,
+    forecast,
+    history,
+    place,
+    place_alias,
+    prefix_cache,
+    request_counter,
+    snapshot,
+    upstream_quota,
+    upstream_stat,
+)
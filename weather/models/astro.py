@@ -1,4 +1,11 @@
-from odoo import fields, models
+from datetime import datetime, time, timedelta
+
+from dateutil import tz
+
+from odoo import api, fields, models
+
+from ..exceptions import WeatherError
+from ..utils.solar import solar_events
 
 
 class Astro(models.Model):
@@ -17,3 +24,55 @@ class Astro(models.Model):
     nautical_twilight_end = fields.Datetime()
     astronomical_twilight_begin = fields.Datetime()
     astronomical_twilight_end = fields.Datetime()
+
+    @api.model
+    def _precompute(self, place, date_from, days):
+        """Compute and store the missing astro rows of the place in one pass.
+
+        Times are stored in the local time of the place, as naive datetimes.
+        """
+        if not place.lat or not place.lon:
+            method_name = "get_astro"
+            raise WeatherError(method_name, f"No coordinates for {place.name}.")
+        lat, lon = place.latitude, place.longitude
+        to_zone = tz.gettz(place.timezone or "UTC")
+        date_to = date_from + timedelta(days=days - 1)
+        existing = set(
+            self.search(
+                [
+                    ("place_id", "=", place.id),
+                    ("date", ">=", date_from),
+                    ("date", "<=", date_to),
+                ],
+            ).mapped("date"),
+        )
+        vals_list = []
+        for offset in range(days):
+            date = date_from + timedelta(days=offset)
+            if date in existing:
+                continue
+            vals = {"place_id": place.id, "date": date}
+            for name, value in solar_events(date, lat, lon).items():
+                if name != "day_length" and value:
+                    value = (
+                        value.replace(tzinfo=tz.UTC)
+                        .astimezone(to_zone)
+                        .replace(tzinfo=None)
+                    )
+                vals[name] = value
+            vals_list.append(vals)
+        return self.create(vals_list)
+
+    def _get_daylight(self):
+        """Return the (sunrise, sunset) pair shown for the day.
+
+        Without sunrise nor sunset, the pair spans the whole day on a polar
+        day, and shrinks to the solar noon on a polar night.
+        """
+        self.ensure_one()
+        if self.day_length:
+            start = datetime.combine(self.date, time.min)
+            default = (start, start + timedelta(hours=23, minutes=59))
+        else:
+            default = (self.solar_noon, self.solar_noon)
+        return self.sunrise or default[0], self.sunset or default[1]
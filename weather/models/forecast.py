@@ -1,62 +1,87 @@
-from odoo import api, fields, models
+from odoo import fields, models, tools
 
-from ..constants import CURRENT, EVENT_TYPE
+from ..constants import CURRENT, EVENT_TYPE, FORECASTED_DAILY, FORECASTED_HOURLY
 
 
 class Forecast(models.Model):
+    """Row-per-event view over the weather.snapshot payloads.
+
+    Kept for the list and graph views; the data itself is written to
+    weather.snapshot only.
+    """
+
     _name = "weather.forecast"
     _description = "Forecast"
+    _auto = False
+    _order = "event"
 
-    place_id = fields.Many2one("weather.place", required=True)
-    fixed = fields.Datetime(required=True)
-    ev_type = fields.Selection(EVENT_TYPE, default=CURRENT, string="Type")
-    event = fields.Datetime(required=True)
-    lat = fields.Char()
-    lon = fields.Char()
-    location = fields.Char()
-    elevation = fields.Integer()
-    timezone = fields.Char()
-    units = fields.Char()
-    weather = fields.Char()
-    icon = fields.Integer()
-    summary = fields.Char()
-    temperature = fields.Float(aggregator="avg")
-    temperature_min = fields.Float(aggregator="avg")
-    temperature_max = fields.Float(aggregator="avg")
-    wind_speed = fields.Float(aggregator="avg")
-    wind_angle = fields.Integer()
-    wind_dir = fields.Char()
-    prec_total = fields.Float(aggregator="avg")
-    prec_type = fields.Char()
-    cloud_cover = fields.Integer()
+    place_id = fields.Many2one("weather.place", readonly=True)
+    snapshot_id = fields.Many2one("weather.snapshot", readonly=True)
+    fixed = fields.Datetime(readonly=True)
+    ev_type = fields.Selection(EVENT_TYPE, string="Type", readonly=True)
+    event = fields.Datetime(readonly=True)
+    lat = fields.Char(readonly=True)
+    lon = fields.Char(readonly=True)
+    location = fields.Char(readonly=True)
+    elevation = fields.Integer(readonly=True)
+    timezone = fields.Char(readonly=True)
+    units = fields.Char(readonly=True)
+    weather = fields.Char(readonly=True)
+    icon = fields.Integer(readonly=True)
+    summary = fields.Char(readonly=True)
+    temperature = fields.Float(aggregator="avg", readonly=True)
+    temperature_min = fields.Float(aggregator="avg", readonly=True)
+    temperature_max = fields.Float(aggregator="avg", readonly=True)
+    wind_speed = fields.Float(aggregator="avg", readonly=True)
+    wind_angle = fields.Integer(readonly=True)
+    wind_dir = fields.Char(readonly=True)
+    prec_total = fields.Float(aggregator="avg", readonly=True)
+    prec_type = fields.Char(readonly=True)
+    cloud_cover = fields.Integer(readonly=True)
 
-    @api.model
-    def web_search_read(
-        self,
-        domain,
-        specification,
-        offset=0,
-        limit=None,
-        order=None,
-        count_limit=None,
-    ):
-        records_count = self.env["weather.place"].search_count([])
-        if not records_count:
-            place = self.env["weather.place"].create(
-                {"place_id": "london", "name": "London"},
-            )
-            self.create(
-                {
-                    "place_id": place.id,
-                    "fixed": fields.Datetime.now(),
-                    "event": fields.Datetime.now(),
-                },
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        # Row ids are derived from the snapshot id and the position of the
+        # event in its series: current is 0, hourly 1..499, daily 500 and up.
+        self.env.cr.execute(
+            f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT
+                    s.id::bigint * 1000 + series.base + i AS id,
+                    s.id AS snapshot_id,
+                    s.place_id,
+                    s.fixed,
+                    series.ev_type,
+                    (series.data->'event'->>i)::timestamp AS event,
+                    s.lat,
+                    s.lon,
+                    NULL::varchar AS location,
+                    s.elevation,
+                    s.timezone,
+                    s.units,
+                    series.data->'weather'->>i AS weather,
+                    (series.data->'icon'->>i)::integer AS icon,
+                    series.data->'summary'->>i AS summary,
+                    (series.data->'temperature'->>i)::float AS temperature,
+                    (series.data->'temperature_min'->>i)::float AS temperature_min,
+                    (series.data->'temperature_max'->>i)::float AS temperature_max,
+                    (series.data->'wind_speed'->>i)::float AS wind_speed,
+                    (series.data->'wind_angle'->>i)::integer AS wind_angle,
+                    series.data->'wind_dir'->>i AS wind_dir,
+                    (series.data->'prec_total'->>i)::float AS prec_total,
+                    series.data->'prec_type'->>i AS prec_type,
+                    (series.data->'cloud_cover'->>i)::integer AS cloud_cover
+                FROM weather_snapshot s
+                CROSS JOIN LATERAL (
+                    VALUES
+                        (0, '{CURRENT}', s.current),
+                        (1, '{FORECASTED_HOURLY}', s.hourly),
+                        (500, '{FORECASTED_DAILY}', s.daily)
+                ) AS series(base, ev_type, data)
+                CROSS JOIN LATERAL generate_series(
+                    0,
+                    COALESCE(jsonb_array_length(series.data->'event'), 0) - 1
+                ) AS i
             )
-        return super().web_search_read(
-            domain,
-            specification,
-            offset=offset,
-            limit=limit,
-            order=order,
-            count_limit=count_limit,
+            """,
         )
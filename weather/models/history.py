@@ -0,0 +1,72 @@
+from odoo import api, fields, models
+
+from ..constants import FORECASTED_HOURLY
+
+
+class History(models.Model):
+    """Daily weather of a place, rolled up from the hourly forecasts."""
+
+    _name = "weather.history"
+    _description = "Weather History"
+    _order = "date desc"
+
+    place_id = fields.Many2one("weather.place", required=True, ondelete="cascade")
+    date = fields.Date(required=True)
+    temperature_min = fields.Float(aggregator="min")
+    temperature_max = fields.Float(aggregator="max")
+    temperature_avg = fields.Float(aggregator="avg")
+    prec_total = fields.Float(aggregator="sum")
+
+    _sql_constraints = [
+        (
+            "place_date_uniq",
+            "unique (place_id, date)",
+            "One history row per place and day.",
+        ),
+    ]
+
+    @api.model
+    def _rollup(self, date_from, date_to):
+        """Roll up the days in [date_from, date_to) from the stored snapshots.
+
+        Every hour of a day is taken from the latest snapshot that forecast
+        it, so the rollup is only complete while those snapshots are kept.
+        """
+        self.env.cr.execute(
+            """
+            INSERT INTO weather_history (
+                place_id, date, temperature_min, temperature_max,
+                temperature_avg, prec_total,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT
+                place_id, event::date, min(temperature), max(temperature),
+                avg(temperature), sum(prec_total),
+                %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM (
+                SELECT DISTINCT ON (place_id, event)
+                    place_id, event, temperature, prec_total
+                FROM weather_forecast
+                WHERE ev_type = %(ev_type)s
+                    AND event >= %(date_from)s
+                    AND event < %(date_to)s
+                ORDER BY place_id, event, fixed DESC
+            ) AS hourly
+            GROUP BY place_id, event::date
+            ON CONFLICT (place_id, date) DO UPDATE SET
+                temperature_min = EXCLUDED.temperature_min,
+                temperature_max = EXCLUDED.temperature_max,
+                temperature_avg = EXCLUDED.temperature_avg,
+                prec_total = EXCLUDED.prec_total,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            """,
+            {
+                "uid": self.env.uid,
+                "ev_type": FORECASTED_HOURLY,
+                "date_from": date_from,
+                "date_to": date_to,
+            },
+        )
+        self.invalidate_model()
+        return self.env.cr.rowcount
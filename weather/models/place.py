@@ -1,4 +1,11 @@
-from odoo import fields, models
+import math
+from datetime import date, timedelta
+
+from odoo import api, fields, models, tools
+from odoo.tools import escape_psql
+
+from ..constants import PLACE_RADIUS, PLACE_RADIUS_PARAM, PREFETCH_WINDOW
+from ..utils.geo import EARTH_RADIUS, distance, parse_coordinate
 
 
 class Place(models.Model):
@@ -6,7 +13,7 @@ class Place(models.Model):
     _description = "Place"
 
     place_id = fields.Char(required=True)
-    name = fields.Char(required=True)
+    name = fields.Char(index="trigram", required=True)
     adm_area1 = fields.Char()
     adm_area2 = fields.Char()
     country = fields.Char()
@@ -14,6 +21,148 @@ class Place(models.Model):
     lon = fields.Char()
     timezone = fields.Char()
     type = fields.Char()
-    search_name = fields.Char()
-    lat_cut = fields.Char()
-    lon_cut = fields.Char()
+    search_name = fields.Char(index="trigram")
+    latitude = fields.Float(compute="_compute_coordinates", store=True)
+    longitude = fields.Float(compute="_compute_coordinates", store=True)
+    refresh_requested = fields.Boolean(
+        help="A stale forecast was served, the refresh cron will fetch a new one.",
+    )
+    request_count = fields.Integer(
+        compute="_compute_request_count",
+        help="Forecast requests over the last days, used to rank the prefetch.",
+    )
+
+    def init(self):
+        tools.create_index(
+            self.env.cr,
+            "weather_place_coordinates_index",
+            self._table,
+            ["latitude", "longitude"],
+        )
+
+    @api.depends("lat", "lon")
+    def _compute_coordinates(self):
+        for place in self:
+            try:
+                place.latitude = parse_coordinate(place.lat)
+                place.longitude = parse_coordinate(place.lon)
+            except (TypeError, ValueError):
+                place.latitude = place.longitude = False
+
+    def _compute_request_count(self):
+        since = date.today() - timedelta(days=PREFETCH_WINDOW)
+        counts = dict(
+            self.env["weather.request.counter"]._read_group(
+                [("place_id", "in", self.ids), ("date", ">=", since)],
+                ["place_id"],
+                ["count:sum"],
+            ),
+        )
+        for place in self:
+            place.request_count = counts.get(place, 0)
+
+    def _request_refresh(self):
+        """Queue the places for the background forecast refresh."""
+        to_refresh = self.filtered(lambda place: not place.refresh_requested)
+        if to_refresh:
+            to_refresh.sudo().refresh_requested = True
+            self.env.ref("weather.ir_cron_refresh_snapshots").sudo()._trigger()
+
+    @api.model
+    def _get_radius(self):
+        """Return the radius, in km, within which a known place is reused."""
+        ICP = self.env["ir.config_parameter"].sudo()
+        return float(ICP.get_param(PLACE_RADIUS_PARAM, PLACE_RADIUS))
+
+    def _add_alias(self, lat, lon):
+        """Resolve the later lookups around the coordinates to the place.
+
+        Only needed when the coordinates are out of the radius of the place,
+        the place itself is found otherwise.
+        """
+        self.ensure_one()
+        if distance(lat, lon, self.latitude, self.longitude) > self._get_radius():
+            self.env["weather.place.alias"].create(
+                {"place_id": self.id, "latitude": lat, "longitude": lon},
+            )
+
+    @api.model
+    def _find_nearest(self, lat, lon):
+        """Return the known place nearest to the coordinates within the radius."""
+        return self._find_nearest_many([(lat, lon)])[0]
+
+    @api.model
+    def _find_nearest_many(self, coordinates):
+        """Return the nearest known place of every (lat, lon) pair, in one query.
+
+        The candidates are the places and the aliases of coordinates
+        resolved before, narrowed by the indexed bounding box of the radius
+        and ordered by their equirectangular distance. Pairs without a
+        candidate in the radius get an empty recordset.
+        """
+        if not coordinates:
+            return []
+        radius = self._get_radius()
+        lats, lons = zip(*coordinates)
+        self.env.cr.execute(
+            """
+            SELECT q.idx, p.id, p.latitude, p.longitude
+            FROM unnest(%(lats)s::float8[], %(lons)s::float8[])
+                WITH ORDINALITY AS q(lat, lon, idx)
+            CROSS JOIN LATERAL (
+                SELECT id, latitude, longitude
+                FROM (
+                    SELECT id, latitude, longitude
+                    FROM weather_place
+                    UNION ALL
+                    SELECT place_id, latitude, longitude
+                    FROM weather_place_alias
+                ) AS c
+                WHERE latitude BETWEEN q.lat - %(dlat)s AND q.lat + %(dlat)s
+                    AND longitude
+                        BETWEEN q.lon - %(dlat)s / greatest(cos(radians(q.lat)), 0.01)
+                        AND q.lon + %(dlat)s / greatest(cos(radians(q.lat)), 0.01)
+                ORDER BY (latitude - q.lat) ^ 2
+                    + ((longitude - q.lon) * cos(radians(q.lat))) ^ 2
+                LIMIT 1
+            ) AS p
+            """,
+            {
+                "lats": list(lats),
+                "lons": list(lons),
+                "dlat": math.degrees(radius / EARTH_RADIUS),
+            },
+        )
+        result = [self.browse()] * len(coordinates)
+        for idx, place_id, latitude, longitude in self.env.cr.fetchall():
+            lat, lon = coordinates[idx - 1]
+            if distance(lat, lon, latitude, longitude) <= radius:
+                result[idx - 1] = self.browse(place_id)
+        return result
+
+    @api.model
+    def _search_prefix(self, prefix, limit):
+        """Return the known places whose name or searched name starts with the prefix.
+
+        Exact matches come first, then name matches, then the most
+        requested places.
+        """
+        prefix = prefix.strip()
+        pattern = escape_psql(prefix) + "%"
+        places = self.search(
+            ["|", ("name", "=ilike", pattern), ("search_name", "=ilike", pattern)],
+            limit=limit * 2,
+        )
+        lower = prefix.lower()
+
+        def rank(place):
+            name = (place.name or "").lower()
+            search_name = (place.search_name or "").lower()
+            return (
+                lower not in (name, search_name),
+                not name.startswith(lower),
+                -place.request_count,
+                name,
+            )
+
+        return places.sorted(rank)[:limit]
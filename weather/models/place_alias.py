@@ -0,0 +1,29 @@
+from odoo import fields, models, tools
+
+
+class PlaceAlias(models.Model):
+    """Coordinates resolved by nearest_place to a place out of their radius.
+
+    The nearest place lookup also matches them, so that the later requests
+    around the same coordinates don't call the upstream API again.
+    """
+
+    _name = "weather.place.alias"
+    _description = "Place Alias"
+
+    place_id = fields.Many2one(
+        "weather.place",
+        required=True,
+        index=True,
+        ondelete="cascade",
+    )
+    latitude = fields.Float(required=True)
+    longitude = fields.Float(required=True)
+
+    def init(self):
+        tools.create_index(
+            self.env.cr,
+            "weather_place_alias_coordinates_index",
+            self._table,
+            ["latitude", "longitude"],
+        )
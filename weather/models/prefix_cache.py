@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+from ..constants import PREFIX_CACHE_TTL
+from ..exceptions import QuotaExceeded, WeatherError
+from ..utils.meteosource import UPSTREAM_POOL, request_places_prefix
+
+
+class PrefixCache(models.Model):
+    """Meteosource find_places_prefix results, keyed by the lowercased prefix."""
+
+    _name = "weather.prefix.cache"
+    _description = "Place Prefix Cache"
+
+    prefix = fields.Char(required=True)
+    results = fields.Json()
+    fetched = fields.Datetime(required=True)
+
+    _sql_constraints = [
+        ("prefix_uniq", "unique (prefix)", "The prefix is already cached."),
+    ]
+
+    @api.model
+    def _lookup(self, text):
+        """Return the upstream places matching the text, cached when possible.
+
+        Expired results are still returned when the Meteosource quota is spent.
+        """
+        results = self._lookup_many([text])[text]
+        if isinstance(results, WeatherError):
+            raise results
+        return results
+
+    @api.model
+    def _lookup_many(self, texts):
+        """Batched :meth:`_lookup`, the upstream searches run concurrently.
+
+        :return: dict mapping every text to its places or to the WeatherError
+            raised while searching them
+        """
+        prefixes = {text: text.strip().lower() for text in texts}
+        queries = {prefix: text for text, prefix in prefixes.items()}
+        lifetime = fields.Datetime.now() - timedelta(days=PREFIX_CACHE_TTL)
+        cached = {
+            entry.prefix: entry
+            for entry in self.search([("prefix", "in", list(queries))])
+        }
+        Quota = self.env["weather.upstream.quota"].sudo()
+        found = {}
+        futures = {}
+        for prefix, text in queries.items():
+            entry = cached.get(prefix)
+            if entry and entry.fetched > lifetime:
+                found[prefix] = entry.results or []
+                continue
+            try:
+                Quota._acquire("find_places_prefix", "get_place")
+            except QuotaExceeded as inst:
+                found[prefix] = (entry.results or []) if entry else inst
+                continue
+            futures[prefix] = UPSTREAM_POOL.submit(request_places_prefix, text)
+
+        for prefix, future in futures.items():
+            try:
+                results = future.result()
+            except WeatherError as inst:
+                found[prefix] = inst
+                continue
+            if not isinstance(results, list):
+                method_name = "get_place"
+                found[prefix] = WeatherError(
+                    method_name,
+                    f"Wrong type of response data: {results}",
+                )
+                continue
+            vals = {"results": results, "fetched": fields.Datetime.now()}
+            if prefix in cached:
+                cached[prefix].write(vals)
+            else:
+                self.create({"prefix": prefix, **vals})
+            found[prefix] = results
+        return {text: found[prefix] for text, prefix in prefixes.items()}
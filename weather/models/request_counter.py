@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+
+from odoo import api, fields, models
+
+from ..constants import PREFETCH_WINDOW
+
+
+class RequestCounter(models.Model):
+    """Number of /weather/data requests served per place and day."""
+
+    _name = "weather.request.counter"
+    _description = "Weather Request Counter"
+    _order = "date desc"
+
+    place_id = fields.Many2one("weather.place", required=True, ondelete="cascade")
+    date = fields.Date(required=True)
+    count = fields.Integer()
+
+    _sql_constraints = [
+        (
+            "place_date_uniq",
+            "unique (place_id, date)",
+            "One counter per place and day.",
+        ),
+    ]
+
+    @api.model
+    def _count_request(self, places):
+        """Increment today's counter of the places.
+
+        The upsert runs in its own READ COMMITTED transaction so that
+        concurrent requests for the same place neither conflict with each
+        other nor with the request transaction. A place created by the
+        current transaction is not visible there and is simply not counted.
+        """
+        if not places:
+            return
+        with self.env.registry.cursor() as cr:
+            cr.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+            cr.execute(
+                """
+                INSERT INTO weather_request_counter
+                    (place_id, date, count, create_uid, create_date, write_uid, write_date)
+                SELECT id, %(date)s, 1, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                FROM weather_place
+                WHERE id IN %(place_ids)s
+                ON CONFLICT (place_id, date) DO UPDATE
+                    SET count = weather_request_counter.count + 1,
+                        write_date = EXCLUDED.write_date
+                """,
+                {
+                    "place_ids": tuple(places.ids),
+                    "date": date.today(),
+                    "uid": self.env.uid,
+                },
+            )
+
+    @api.model
+    def _top_places(self, limit):
+        """Return the places with the most requests over the last days."""
+        since = date.today() - timedelta(days=PREFETCH_WINDOW)
+        groups = self._read_group(
+            [("date", ">=", since)],
+            ["place_id"],
+            ["count:sum"],
+            order="count:sum desc",
+            limit=limit,
+        )
+        return self.env["weather.place"].browse([place.id for place, _count in groups])
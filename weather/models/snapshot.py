@@ -0,0 +1,532 @@
+import logging
+import math
+from datetime import datetime, timedelta
+
+from odoo import api, fields, models, tools
+from odoo.tools import str2bool
+
+from ..constants import (
+    CACHE_FETCHED,
+    CACHE_FRESH,
+    CACHE_STALE,
+    FORECAST_FETCH_LOCK,
+    FORECAST_FRESH_TTL,
+    FORECAST_FRESH_TTL_PARAM,
+    FORECAST_STALE_TTL,
+    FORECAST_STALE_TTL_PARAM,
+    HISTORY_ROLLUP_PARAM,
+    PREFETCH_BUDGET_RESERVE,
+    PREFETCH_INTERVAL,
+    PREFETCH_LEAD,
+    PREFETCH_TOP_N,
+    PREFETCH_TOP_N_PARAM,
+    RETENTION_BATCH_SIZE,
+    SERIES_FIELDS,
+    SNAPSHOT_RETENTION,
+    SNAPSHOT_RETENTION_PARAM,
+)
+from ..exceptions import QuotaExceeded, WeatherError
+from ..utils.meteosource import UPSTREAM_POOL, request_forecast
+
+_logger = logging.getLogger(__name__)
+
+
+# Stored snapshot values, besides place_id, that the controller reads.
+SNAPSHOT_FIELDS = (
+    "fixed",
+    "lat",
+    "lon",
+    "elevation",
+    "timezone",
+    "units",
+    "current",
+    "hourly",
+    "daily",
+)
+
+
+class Snapshot(models.Model):
+    """One Meteosource fetch for a place.
+
+    The current, hourly and daily series are kept as columnar payloads:
+    a dict mapping every name of ``SERIES_FIELDS`` to a list of values.
+    """
+
+    _name = "weather.snapshot"
+    _description = "Forecast Snapshot"
+    _order = "fixed desc"
+
+    place_id = fields.Many2one("weather.place", required=True, ondelete="cascade")
+    fixed = fields.Datetime(required=True)
+    lat = fields.Char()
+    lon = fields.Char()
+    elevation = fields.Integer()
+    timezone = fields.Char()
+    units = fields.Char()
+    # Loaded together, and only when the series are actually read.
+    current = fields.Json(prefetch="series")
+    hourly = fields.Json(prefetch="series")
+    daily = fields.Json(prefetch="series")
+
+    def init(self):
+        # Serves the "newest snapshot of the place" lookups of the cache.
+        tools.create_index(
+            self.env.cr,
+            "weather_snapshot_place_id_fixed_index",
+            self._table,
+            ["place_id", "fixed DESC"],
+        )
+
+    @api.model
+    def _series(self, rows):
+        """Pack a list of row dicts into a columnar series."""
+        return {name: [row.get(name) for row in rows] for name in SERIES_FIELDS}
+
+    @api.model
+    def _get_ttls(self):
+        """Return the (fresh, stale) cache lifetimes as timedeltas."""
+        ICP = self.env["ir.config_parameter"].sudo()
+        fresh = int(ICP.get_param(FORECAST_FRESH_TTL_PARAM, FORECAST_FRESH_TTL))
+        stale = int(ICP.get_param(FORECAST_STALE_TTL_PARAM, FORECAST_STALE_TTL))
+        return timedelta(minutes=fresh), timedelta(minutes=max(fresh, stale))
+
+    @api.model
+    def _get_cached(self, place):
+        """Return the snapshot to serve for the place and its cache status.
+
+        A stale snapshot is returned right away and the place is queued for
+        the refresh cron, only a miss calls the upstream API synchronously.
+        When the Meteosource quota is spent, the newest snapshot is served
+        as stale whatever its age.
+        """
+        fresh_ttl, stale_ttl = self._get_ttls()
+        now = datetime.now()
+        snapshot = self.search_fetch(
+            [("place_id", "=", place.id), ("fixed", ">", now - stale_ttl)],
+            ["fixed"],
+            limit=1,
+        )
+        if not snapshot:
+            try:
+                return self._fetch_coalesced(place), CACHE_FETCHED
+            except QuotaExceeded as inst:
+                return self._get_latest(place, inst), CACHE_STALE
+        if snapshot.fixed > now - fresh_ttl:
+            return snapshot, CACHE_FRESH
+        place._request_refresh()
+        return snapshot, CACHE_STALE
+
+    @api.model
+    def _get_cached_many(self, places):
+        """Batched :meth:`_get_cached`, with a single search for all the places.
+
+        :return: dict mapping place ids to a (snapshot, status) pair or to
+            the WeatherError raised while fetching the place
+        """
+        fresh_ttl, stale_ttl = self._get_ttls()
+        now = datetime.now()
+        snapshots = self.search_fetch(
+            [("place_id", "in", places.ids), ("fixed", ">", now - stale_ttl)],
+            ["place_id", "fixed"],
+            order="place_id, fixed desc",
+        )
+        latest = {}
+        for snapshot in snapshots:
+            latest.setdefault(snapshot.place_id.id, snapshot)
+        results = {}
+        stale = self.env["weather.place"]
+        for place in places:
+            snapshot = latest.get(place.id)
+            if not snapshot:
+                continue
+            if snapshot.fixed > now - fresh_ttl:
+                results[place.id] = (snapshot, CACHE_FRESH)
+            else:
+                results[place.id] = (snapshot, CACHE_STALE)
+                stale |= place
+        stale._request_refresh()
+        misses = places.filtered(lambda place: place.id not in results)
+        for place_id, snapshot in self._fetch_many(misses).items():
+            if isinstance(snapshot, QuotaExceeded):
+                place = places.browse(place_id)
+                try:
+                    snapshot = self._get_latest(place, snapshot)
+                    results[place_id] = (snapshot, CACHE_STALE)
+                except QuotaExceeded as inst:
+                    results[place_id] = inst
+            elif isinstance(snapshot, WeatherError):
+                results[place_id] = snapshot
+            else:
+                results[place_id] = (snapshot, CACHE_FETCHED)
+        return results
+
+    @api.model
+    def _get_latest(self, place, error):
+        """Return the newest snapshot of the place whatever its age, or raise error."""
+        snapshot = self.search_fetch([("place_id", "=", place.id)], ["fixed"], limit=1)
+        if not snapshot:
+            raise error
+        _logger.info("Weather of %s served from an old snapshot: %s", place.name, error)
+        return snapshot
+
+    @api.model
+    def _acquire_quota(self):
+        """Take a token for a Meteosource point call, or raise QuotaExceeded."""
+        self.env["weather.upstream.quota"].sudo()._acquire(
+            "point",
+            "get_forecast_api_data",
+        )
+
+    @api.model
+    def _fetch(self, place):
+        """Fetch the forecast of the place from Meteosource and store it."""
+        self._acquire_quota()
+        return self._create_from_api(place, request_forecast(place.place_id))
+
+    @api.model
+    def _create_from_api(self, place, ret):
+        """Store a Meteosource point response as a snapshot of the place."""
+        fixed = datetime.now().replace(second=0, microsecond=0)
+        try:
+            current = {
+                "event": fixed.isoformat(),
+                "weather": ret["current"]["icon"],
+                "icon": ret["current"]["icon_num"],
+                "summary": ret["current"]["summary"],
+                "temperature": ret["current"]["temperature"],
+                "wind_speed": ret["current"]["wind"]["speed"],
+                "wind_angle": ret["current"]["wind"]["angle"],
+                "wind_dir": ret["current"]["wind"]["dir"],
+                "prec_total": ret["current"]["precipitation"]["total"],
+                "prec_type": ret["current"]["precipitation"]["type"],
+                "cloud_cover": ret["current"]["cloud_cover"],
+            }
+            hourly = [
+                {
+                    "event": datetime.strptime(
+                        hour["date"],
+                        "%Y-%m-%dT%H:%M:%S",
+                    ).isoformat(),
+                    "weather": hour["weather"],
+                    "icon": hour["icon"],
+                    "summary": hour["summary"],
+                    "temperature": hour["temperature"],
+                    "wind_speed": hour["wind"]["speed"],
+                    "wind_angle": hour["wind"]["angle"],
+                    "wind_dir": hour["wind"]["dir"],
+                    "prec_total": hour["precipitation"]["total"],
+                    "prec_type": hour["precipitation"]["type"],
+                    "cloud_cover": hour["cloud_cover"]["total"],
+                }
+                for hour in ret["hourly"]["data"]
+            ]
+            daily = [
+                {
+                    "event": datetime.strptime(day["day"], "%Y-%m-%d").isoformat(),
+                    "weather": day["weather"],
+                    "icon": day["icon"],
+                    "summary": day["summary"],
+                    "temperature": day["all_day"]["temperature"],
+                    "temperature_min": day["all_day"]["temperature_min"],
+                    "temperature_max": day["all_day"]["temperature_max"],
+                    "wind_speed": day["all_day"]["wind"]["speed"],
+                    "wind_angle": day["all_day"]["wind"]["angle"],
+                    "wind_dir": day["all_day"]["wind"]["dir"],
+                    "prec_total": day["all_day"]["precipitation"]["total"],
+                    "prec_type": day["all_day"]["precipitation"]["type"],
+                    "cloud_cover": day["all_day"]["cloud_cover"]["total"],
+                }
+                for day in ret["daily"]["data"]
+            ]
+            snapshot = self.create(
+                {
+                    "place_id": place.id,
+                    "fixed": fixed,
+                    "lat": ret["lat"],
+                    "lon": ret["lon"],
+                    "elevation": ret["elevation"],
+                    "timezone": ret["timezone"],
+                    "units": ret["units"],
+                    "current": self._series([current]),
+                    "hourly": self._series(hourly),
+                    "daily": self._series(daily),
+                },
+            )
+        except (KeyError, ValueError, TypeError) as ex:
+            method_name = "get_forecast_api_data"
+            raise WeatherError(method_name, f"Exception: {ex!s}, {ret=}") from ex
+        return snapshot
+
+    @api.model
+    def _fetch_many(self, places):
+        """Fetch the forecasts of several places, calling Meteosource concurrently.
+
+        The places are locked with non-blocking advisory locks taken in a
+        cursor of their own, and their snapshots are stored and committed
+        in a second cursor before the locks are released, as in
+        :meth:`_fetch_coalesced`: no lock outlives this method. A snapshot
+        committed meanwhile by another worker is reused. The places that
+        another worker is fetching go through :meth:`_fetch_coalesced` once
+        the locks are released, so that waiting for them holds no lock. A
+        place left without quota gets a QuotaExceeded.
+
+        :return: dict mapping place ids to a snapshot or a WeatherError
+        """
+        fresh_ttl, _stale_ttl = self._get_ttls()
+        results = {}
+        locked = []
+        with self.env.registry.cursor() as lock_cr:
+            for place_id in sorted(places.ids):
+                lock_cr.execute(
+                    "SELECT pg_try_advisory_xact_lock(%s, %s)",
+                    (FORECAST_FETCH_LOCK, place_id),
+                )
+                if lock_cr.fetchone()[0]:
+                    locked.append(place_id)
+            with self.env.registry.cursor() as cr:
+                Snapshot = self.with_env(self.env(cr=cr))
+                shared = Snapshot.env["weather.place"].browse(locked).exists()
+                fresh = {}
+                for snapshot in Snapshot.search_fetch(
+                    [
+                        ("place_id", "in", shared.ids),
+                        ("fixed", ">", datetime.now() - fresh_ttl),
+                    ],
+                    ["place_id", *SNAPSHOT_FIELDS],
+                    order="place_id, fixed desc",
+                ):
+                    fresh.setdefault(snapshot.place_id.id, snapshot)
+                # Places created by the current transaction, no other worker
+                # can be fetching them.
+                local = places.browse(
+                    [place_id for place_id in locked if place_id not in shared.ids],
+                )
+                futures = Snapshot._start_fetch(
+                    shared.filtered(lambda place: place.id not in fresh),
+                )
+                local_futures = self._start_fetch(local)
+                fetched = Snapshot._finish_fetch(futures)
+                for place_id, snapshot in {**fresh, **fetched}.items():
+                    if isinstance(snapshot, WeatherError):
+                        results[place_id] = snapshot
+                    else:
+                        values = {name: snapshot[name] for name in SNAPSHOT_FIELDS}
+                        results[place_id] = self.new({**values, "place_id": place_id})
+        results.update(self._finish_fetch(local_futures))
+        for place in places.filtered(lambda place: place.id not in locked):
+            try:
+                results[place.id] = self._fetch_coalesced(place)
+            except WeatherError as inst:
+                results[place.id] = inst
+        return results
+
+    @api.model
+    def _start_fetch(self, places):
+        """Start the Meteosource calls of the places in the upstream pool.
+
+        :return: dict mapping place ids to a future or a QuotaExceeded
+        """
+        futures = {}
+        for place in places:
+            try:
+                self._acquire_quota()
+            except QuotaExceeded as inst:
+                futures[place.id] = inst
+                continue
+            futures[place.id] = UPSTREAM_POOL.submit(request_forecast, place.place_id)
+        return futures
+
+    @api.model
+    def _finish_fetch(self, futures):
+        """Store the snapshots of the calls started by :meth:`_start_fetch`.
+
+        :return: dict mapping place ids to a snapshot or a WeatherError
+        """
+        results = {}
+        Place = self.env["weather.place"]
+        for place_id, future in futures.items():
+            if isinstance(future, WeatherError):
+                results[place_id] = future
+                continue
+            try:
+                results[place_id] = self._create_from_api(
+                    Place.browse(place_id),
+                    future.result(),
+                )
+            except WeatherError as inst:
+                results[place_id] = inst
+        return results
+
+    @api.model
+    def _fetch_coalesced(self, place, max_age=None):
+        """Fetch the forecast of the place, at most once across workers.
+
+        Concurrent misses for the same place wait on a PostgreSQL advisory
+        lock: the first worker calls Meteosource and commits the snapshot,
+        the others find it once the lock is released. The work runs in a
+        cursor opened after the lock is granted so that the snapshot
+        committed by another worker is visible. The returned record holds
+        the values in memory, the caller's transaction may not see the row.
+
+        :param max_age: age under which an existing snapshot is reused,
+            defaults to the fresh TTL.
+        """
+        if max_age is None:
+            max_age, _stale_ttl = self._get_ttls()
+        with self.env.registry.cursor() as lock_cr:
+            lock_cr.execute(
+                "SELECT pg_advisory_xact_lock(%s, %s)",
+                (FORECAST_FETCH_LOCK, place.id),
+            )
+            with self.env.registry.cursor() as cr:
+                Snapshot = self.with_env(self.env(cr=cr))
+                shared_place = Snapshot.env["weather.place"].browse(place.id)
+                if shared_place.exists():
+                    snapshot = Snapshot.search(
+                        [
+                            ("place_id", "=", place.id),
+                            ("fixed", ">", datetime.now() - max_age),
+                        ],
+                        limit=1,
+                    ) or Snapshot._fetch(shared_place)
+                    values = {name: snapshot[name] for name in SNAPSHOT_FIELDS}
+                else:
+                    # The place was created by the current transaction, no
+                    # other worker can be fetching it.
+                    values = None
+        if values is None:
+            return self._fetch(place)
+        return self.new({**values, "place_id": place.id})
+
+    @api.model
+    def _cron_refresh_snapshots(self):
+        """Fetch a new forecast for every place that was served a stale one."""
+        places = self.env["weather.place"].search([("refresh_requested", "=", True)])
+        for place in places:
+            try:
+                self._fetch_coalesced(place)
+            except QuotaExceeded as inst:
+                # Keep the remaining places queued for a later run.
+                _logger.info("Weather refresh stopped: %s", inst)
+                return
+            except WeatherError as inst:
+                _logger.warning("Weather refresh of %s failed: %s", place.name, inst)
+            place.refresh_requested = False
+            self.env.cr.commit()
+
+    @api.model
+    def _cron_prefetch_snapshots(self):
+        """Refresh the forecasts of the most requested places before they expire.
+
+        Each run refreshes only its share of the top places, so that they are
+        spread over the fresh TTL instead of all being fetched at once, and
+        leaves a share of the daily Meteosource budget to the user requests.
+        """
+        ICP = self.env["ir.config_parameter"].sudo()
+        top_n = int(ICP.get_param(PREFETCH_TOP_N_PARAM, PREFETCH_TOP_N))
+        Quota = self.env["weather.upstream.quota"].sudo()
+        reserve = int(Quota._get_budget() * PREFETCH_BUDGET_RESERVE)
+        available = Quota._remaining() - reserve
+        if available <= 0:
+            _logger.info("Weather prefetch skipped, daily budget reserved for users.")
+            return
+        now = datetime.now()
+
+        places = self.env["weather.request.counter"]._top_places(top_n)
+        if not places:
+            return
+        fresh_ttl, _stale_ttl = self._get_ttls()
+        max_age = max(fresh_ttl - timedelta(minutes=PREFETCH_LEAD), timedelta(0))
+        latest = dict(
+            self._read_group(
+                [("place_id", "in", places.ids)],
+                ["place_id"],
+                ["fixed:max"],
+            ),
+        )
+        due = places.filtered(
+            lambda place: place not in latest or latest[place] <= now - max_age,
+        ).sorted(lambda place: latest.get(place) or datetime.min)
+        per_run = math.ceil(
+            len(places) * PREFETCH_INTERVAL / (fresh_ttl.total_seconds() / 60),
+        )
+        for place in due[: min(per_run, available)]:
+            try:
+                self._fetch_coalesced(place, max_age=max_age)
+            except QuotaExceeded as inst:
+                _logger.info("Weather prefetch stopped: %s", inst)
+                return
+            except WeatherError as inst:
+                _logger.warning("Weather prefetch of %s failed: %s", place.name, inst)
+            self.env.cr.commit()
+
+    @api.model
+    def _cron_retention(self):
+        """Delete the superseded snapshots older than the retention period.
+
+        The complete days still covered by the kept snapshots are first
+        rolled up into weather.history, unless disabled. The newest snapshot
+        of every place is always kept.
+        """
+        ICP = self.env["ir.config_parameter"].sudo()
+        days = int(ICP.get_param(SNAPSHOT_RETENTION_PARAM, SNAPSHOT_RETENTION))
+        cutoff = datetime.now() - timedelta(days=days)
+        if str2bool(ICP.get_param(HISTORY_ROLLUP_PARAM, "True")):
+            today = datetime.now().date()
+            self.env["weather.history"]._rollup(cutoff.date(), today)
+            self.env.cr.commit()
+
+        deleted = 0
+        while True:
+            self.env.cr.execute(
+                """
+                DELETE FROM weather_snapshot
+                WHERE id IN (
+                    SELECT s.id
+                    FROM weather_snapshot s
+                    WHERE s.fixed < %s
+                        AND EXISTS (
+                            SELECT 1
+                            FROM weather_snapshot n
+                            WHERE n.place_id = s.place_id AND n.fixed > s.fixed
+                        )
+                    LIMIT %s
+                )
+                """,
+                (cutoff, RETENTION_BATCH_SIZE),
+            )
+            count = self.env.cr.rowcount
+            deleted += count
+            self.env.cr.commit()
+            if count < RETENTION_BATCH_SIZE:
+                break
+        self.invalidate_model()
+        _logger.info(
+            "Weather retention deleted %s snapshots, table sizes: %s",
+            deleted,
+            self._get_table_metrics(),
+        )
+
+    @api.model
+    def _get_table_metrics(self):
+        """Return the row count estimate and total size in bytes of the weather tables."""
+        self.env.cr.execute(
+            """
+            SELECT c.relname, c.reltuples::bigint, pg_total_relation_size(c.oid)
+            FROM pg_class c
+            WHERE c.relkind = 'r' AND c.relname IN %s
+            ORDER BY c.relname
+            """,
+            [
+                (
+                    "weather_snapshot",
+                    "weather_history",
+                    "weather_astro",
+                    "weather_place",
+                ),
+            ],
+        )
+        return {
+            table: {"rows": rows, "size": size}
+            for table, rows, size in self.env.cr.fetchall()
+        }
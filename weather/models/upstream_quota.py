@@ -0,0 +1,109 @@
+from datetime import datetime
+
+from odoo import api, fields, models
+
+from ..constants import (
+    UPSTREAM_DAILY_BUDGET,
+    UPSTREAM_DAILY_BUDGET_PARAM,
+    UPSTREAM_RATE_LIMITS,
+)
+from ..exceptions import QuotaExceeded
+
+
+class UpstreamQuota(models.Model):
+    """Token bucket and daily call count of a Meteosource endpoint."""
+
+    _name = "weather.upstream.quota"
+    _description = "Weather Upstream Quota"
+    _order = "endpoint"
+
+    endpoint = fields.Char(required=True)
+    tokens = fields.Float()
+    refilled = fields.Datetime()
+    date = fields.Date()
+    used = fields.Integer("Calls Today")
+
+    _sql_constraints = [
+        ("endpoint_uniq", "unique (endpoint)", "One quota per endpoint."),
+    ]
+
+    @api.model
+    def _get_budget(self):
+        ICP = self.env["ir.config_parameter"].sudo()
+        return int(ICP.get_param(UPSTREAM_DAILY_BUDGET_PARAM, UPSTREAM_DAILY_BUDGET))
+
+    @api.model
+    def _acquire(self, endpoint, method_name):
+        """Take a token for one call of the endpoint, or raise QuotaExceeded.
+
+        The quota rows are locked and updated in their own READ COMMITTED
+        transaction, committed right away, so that every worker sees the
+        calls of the others and the request transaction holds no lock.
+        """
+        capacity, rate = UPSTREAM_RATE_LIMITS[endpoint]
+        budget = self._get_budget()
+        now = datetime.now().replace(microsecond=0)
+        today = now.date()
+        with self.env.registry.cursor() as cr:
+            cr.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+            cr.execute(
+                """
+                INSERT INTO weather_upstream_quota
+                    (endpoint, tokens, refilled, date, used, create_uid, create_date, write_uid, write_date)
+                VALUES (%(endpoint)s, %(capacity)s, %(now)s, %(today)s, 0, %(uid)s, %(now)s, %(uid)s, %(now)s)
+                ON CONFLICT (endpoint) DO NOTHING
+                """,
+                {
+                    "endpoint": endpoint,
+                    "capacity": capacity,
+                    "now": now,
+                    "today": today,
+                    "uid": self.env.uid,
+                },
+            )
+            # All the rows are locked since the daily budget is shared.
+            cr.execute(
+                """
+                SELECT endpoint, tokens, refilled, date, used
+                FROM weather_upstream_quota
+                ORDER BY endpoint
+                FOR UPDATE
+                """,
+            )
+            rows = {row[0]: row[1:] for row in cr.fetchall()}
+            used_today = sum(row[3] for row in rows.values() if row[2] == today)
+            if used_today >= budget:
+                raise QuotaExceeded(
+                    method_name,
+                    f"Meteosource daily budget of {budget} calls is spent.",
+                )
+            tokens, refilled, day, used = rows[endpoint]
+            elapsed = (now - refilled).total_seconds() / 60 if refilled else capacity
+            tokens = min(capacity, (tokens or 0) + elapsed * rate)
+            if tokens < 1:
+                raise QuotaExceeded(
+                    method_name,
+                    f"Meteosource rate limit of the {endpoint} endpoint is reached.",
+                )
+            cr.execute(
+                """
+                UPDATE weather_upstream_quota
+                SET tokens = %s, refilled = %s, date = %s, used = %s, write_date = %s
+                WHERE endpoint = %s
+                """,
+                (
+                    tokens - 1,
+                    now,
+                    today,
+                    (used if day == today else 0) + 1,
+                    now,
+                    endpoint,
+                ),
+            )
+
+    @api.model
+    def _remaining(self):
+        """Return the number of Meteosource calls left in today's budget."""
+        today = datetime.now().date()
+        groups = self._read_group([("date", "=", today)], [], ["used:sum"])
+        return max(self._get_budget() - (groups[0][0] or 0), 0)
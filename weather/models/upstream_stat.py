@@ -0,0 +1,71 @@
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+from ..utils.meteosource import get_stats
+
+STAT_COLUMNS = (
+    "id",
+    "endpoint",
+    "calls",
+    "retries",
+    "errors",
+    "avg_latency",
+    "max_latency",
+    "last_error",
+)
+
+
+class UpstreamStat(models.Model):
+    """Latency and error counters of the Meteosource endpoints.
+
+    The counters live in the memory of each worker process, so the values
+    are those of the worker serving the request. The table query unnests
+    them, which lets the views search, group and count them as usual.
+    """
+
+    _name = "weather.upstream.stat"
+    _description = "Weather Upstream Statistics"
+    _auto = False
+    _rec_name = "endpoint"
+    _order = "endpoint"
+
+    endpoint = fields.Char(readonly=True)
+    calls = fields.Integer(readonly=True)
+    retries = fields.Integer(readonly=True)
+    errors = fields.Integer(readonly=True)
+    avg_latency = fields.Float("Average Latency (ms)", readonly=True)
+    max_latency = fields.Float("Max Latency (ms)", readonly=True)
+    last_error = fields.Char(readonly=True)
+
+    @property
+    def _table_query(self):
+        records = self._get_records()
+        return SQL(
+            """
+            SELECT *
+            FROM unnest(
+                %s::int[], %s::varchar[], %s::int[], %s::int[], %s::int[],
+                %s::float8[], %s::float8[], %s::varchar[]
+            ) AS stat(%s)
+            """,
+            *([record[name] for record in records] for name in STAT_COLUMNS),
+            SQL(", ").join(SQL.identifier(name) for name in STAT_COLUMNS),
+        )
+
+    @api.model
+    def _get_records(self):
+        return [
+            {
+                "id": index,
+                "endpoint": endpoint,
+                "calls": stats["calls"],
+                "retries": stats["retries"],
+                "errors": stats["errors"],
+                "avg_latency": (
+                    stats["total_ms"] / stats["calls"] if stats["calls"] else 0
+                ),
+                "max_latency": stats["max_ms"],
+                "last_error": stats["last_error"],
+            }
+            for index, (endpoint, stats) in enumerate(sorted(get_stats().items()), 1)
+        ]
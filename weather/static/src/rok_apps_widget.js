@@ -22,6 +22,7 @@ export class WeatherRokAppsWidget extends RokAppsWidget {
             },
         });
         this.title = "";
+        this.etag = null;
 
         useEffect(
             () => { this.getData(); },
@@ -55,13 +56,17 @@ export class WeatherRokAppsWidget extends RokAppsWidget {
                 location: locality,
                 lat: lat,
                 lon: lon,
+                etag: this.etag,
             });
-            if (response.result != "ok") {
+            if (response.result === "not_modified") {
+                this.state.error = "";
+            } else if (response.result != "ok") {
                 this.state.error = response.info;
                 this.state.toolbar_data.period = "error";
             } else {
                 this.state.error = "";
                 this.state.data = response.data;
+                this.etag = response.etag;
             }
         } catch (error) {
             this.state.error = error.message || error;
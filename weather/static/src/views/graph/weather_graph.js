@@ -28,6 +28,7 @@ export class WeatherGraphRenderer extends GraphRenderer {
         this.onLocationSelected = this.onLocationSelected.bind(this);
         this.onSetLocality = this.onSetLocality.bind(this);
         this.title = "Weather";
+        this.etag = null;
 
         onWillStart(async () => {
             await this.getData();
@@ -65,13 +66,17 @@ export class WeatherGraphRenderer extends GraphRenderer {
                 location: locality,
                 lat: lat,
                 lon: lon,
+                etag: this.etag,
             });
-            if (response.result != "ok") {
+            if (response.result === "not_modified") {
+                this.state.error = "";
+            } else if (response.result != "ok") {
                 this.state.error = response.info;
                 this.state.toolbar_data.period = "error";
             } else {
                 this.state.error = "";
                 this.state.data = response.data;
+                this.etag = response.etag;
             }
         } catch (error) {
             this.state.error = error.message || error;
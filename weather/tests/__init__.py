@@ -0,0 +1,8 @@
+from . import (
+    test_benchmark,
+    test_coalescing,
+    test_payload,
+    test_place,
+    test_snapshot,
+    test_solar,
+)
@@ -0,0 +1,9 @@
+import json
+
+from odoo.tools import file_open
+
+
+def load_fixture(name):
+    """Return the sample Meteosource response of ``fixtures/<name>.json``."""
+    with file_open(f"weather/tests/fixtures/{name}.json") as f:
+        return json.load(f)
@@ -0,0 +1,128 @@
+import json
+import logging
+import re
+import statistics
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import requests
+
+from odoo.tests import HttpCase, tagged
+from odoo.tools import file_path
+
+from odoo.addons.weather.controllers.weather_api import RESPONSE_CACHE
+from odoo.addons.weather.utils import meteosource
+from odoo.addons.weather.utils.replay import ReplayAdapter
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("post_install", "-at_install", "-standard", "weather_benchmark")
+class TestWeatherBenchmark(HttpCase):
+    """Latency and SQL statements of /weather/data, upstream calls replayed.
+
+    Not part of the standard run, select it with
+    ``--test-tags weather_benchmark``. Meteosource is answered from
+    ``fixtures/`` after ``LATENCY`` milliseconds, the percentiles and the
+    statement counts of every scenario are logged.
+    """
+
+    ROUNDS = 20
+    LATENCY = 150
+
+    def setUp(self):
+        super().setUp()
+        session = requests.Session()
+        session.mount(
+            "https://",
+            ReplayAdapter(file_path("weather/tests/fixtures"), latency=self.LATENCY),
+        )
+        self.startPatcher(
+            patch.dict(
+                meteosource._sessions,
+                {"www.meteosource.com": session},
+                clear=True,
+            ),
+        )
+        # The quota is not what is measured.
+        self.startPatcher(
+            patch.object(
+                self.registry["weather.upstream.quota"],
+                "_acquire",
+                lambda self, endpoint, method_name: None,
+            ),
+        )
+        self.place = self.env.ref("weather.place_london")
+        self.Snapshot = self.env["weather.snapshot"]
+        # Computes the astro rows of the place, not measured.
+        self.post({"location": "London"})
+
+    def post(self, params):
+        """Return the result, the duration in ms and the SQL count of a request."""
+        start = time.perf_counter()
+        response = self.url_open(
+            "/weather/data",
+            data=json.dumps({"jsonrpc": "2.0", "method": "call", "params": params}),
+            headers={"Content-Type": "application/json"},
+        )
+        duration = (time.perf_counter() - start) * 1000
+        response.raise_for_status()
+        timing = response.headers.get("Server-Timing", "")
+        queries = re.search(r'sql;desc="(\d+)"', timing)
+        return (
+            response.json()["result"],
+            duration,
+            int(queries.group(1)) if queries else None,
+        )
+
+    def run_scenario(self, name, params, prepare, cache):
+        durations = []
+        queries = []
+        for index in range(self.ROUNDS):
+            prepare(index)
+            result, duration, count = self.post(params)
+            self.assertEqual(result["result"], "ok", result)
+            self.assertEqual(result["cache"], cache)
+            durations.append(duration)
+            queries.append(count)
+        p50 = statistics.median(durations)
+        p95 = statistics.quantiles(durations, n=20)[18]
+        _logger.info(
+            "Weather benchmark %s: p50 %.1f ms, p95 %.1f ms, SQL statements %s",
+            name,
+            p50,
+            p95,
+            statistics.median(queries),
+        )
+
+    def test_weather_data(self):
+        def cold(index):
+            self.Snapshot.search([("place_id", "=", self.place.id)]).unlink()
+            RESPONSE_CACHE.clear()
+
+        def warm(index):
+            pass
+
+        fresh_ttl, _stale_ttl = self.Snapshot._get_ttls()
+
+        def stale(index):
+            snapshot = self.Snapshot.search([("place_id", "=", self.place.id)], limit=1)
+            # A new age on every round, so that the payload is built again.
+            snapshot.fixed -= fresh_ttl + timedelta(minutes=index + 1)
+            self.place.refresh_requested = False
+
+        self.run_scenario("cold", {"location": "London"}, cold, "fetched")
+        self.run_scenario("warm", {"location": "London"}, warm, "fresh")
+        self.run_scenario("stale", {"location": "London"}, stale, "stale")
+
+        def cold_coordinates(index):
+            self.env["weather.place.alias"].search([]).unlink()
+            cold(index)
+
+        # Far from the known places: nearest_place and point are both called,
+        # the fixture resolves them to London, whose forecast is then fetched.
+        paris = {"lat": "48.85341", "lon": "2.3488"}
+        self.run_scenario("cold_coordinates", paris, cold_coordinates, "fetched")
+        # The alias of the coordinates now resolves them without upstream call.
+        self.run_scenario("warm_coordinates", paris, warm, "fresh")
@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from odoo import SUPERUSER_ID, api
+from odoo.tests import TransactionCase, tagged
+
+from .common import load_fixture
+
+WORKERS = 8
+
+
+@tagged("post_install", "-at_install")
+class TestCoalescing(TransactionCase):
+    """Concurrent forecast misses of a place, each worker being a thread with
+    cursors of its own. The advisory lock only coalesces workers that see
+    the place, so it is committed, and removed at the end of the test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            place = env["weather.place"].create(
+                {"place_id": "weather_test_coalescing", "name": "Coalescing Test"},
+            )
+            self.place_id = place.id
+        self.addCleanup(self._unlink_place)
+
+    def _unlink_place(self):
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            env["weather.place"].browse(self.place_id).unlink()
+
+    def test_single_upstream_call(self):
+        point = load_fixture("point")
+        calls = []
+        barrier = threading.Barrier(WORKERS)
+
+        def request_forecast(place_id=None, lat=None, lon=None):
+            calls.append(place_id)
+            # Long enough for the other workers to queue on the lock.
+            time.sleep(0.5)
+            return point
+
+        def worker():
+            barrier.wait()
+            with self.registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                place = env["weather.place"].browse(self.place_id)
+                return env["weather.snapshot"]._fetch_coalesced(place).fixed
+
+        with (
+            patch(
+                "odoo.addons.weather.models.snapshot.request_forecast",
+                request_forecast,
+            ),
+            patch.object(
+                self.registry["weather.snapshot"],
+                "_acquire_quota",
+                lambda self: None,
+            ),
+            ThreadPoolExecutor(WORKERS) as pool,
+        ):
+            futures = [pool.submit(worker) for _i in range(WORKERS)]
+            fixed = {future.result() for future in futures}
+
+        self.assertEqual(calls, ["weather_test_coalescing"])
+        self.assertEqual(len(fixed), 1, "All the workers get the same snapshot")
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            count = env["weather.snapshot"].search_count(
+                [("place_id", "=", self.place_id)],
+            )
+        self.assertEqual(count, 1)
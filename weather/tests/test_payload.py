@@ -0,0 +1,101 @@
+import logging
+import timeit
+from datetime import date, datetime
+
+from odoo.tests import TransactionCase, tagged
+
+from .common import load_fixture
+from odoo.addons.weather.controllers.weather_api import DayWeather, WeatherController
+
+_logger = logging.getLogger(__name__)
+
+
+def rows(series):
+    """Unpack a columnar series into row dicts, as the payload used to be built."""
+    return [dict(zip(series, values)) for values in zip(*series.values())]
+
+
+def row_to_json(row):
+    """Format one row the way the former DayWeather.from_row/to_json did."""
+    event = datetime.fromisoformat(row["event"])
+    return {
+        "event": event.strftime("%Y-%m-%dT%H:%M:%S"),
+        "state": row["weather"],
+        "summary": row["summary"],
+        "icon_num": row["icon"],
+        "temperature": f"{row['temperature']:.1f}",
+        "temperature_min": (
+            f"{row['temperature_min']:.1f}" if row["temperature_min"] else None
+        ),
+        "temperature_max": (
+            f"{row['temperature_max']:.1f}" if row["temperature_max"] else None
+        ),
+        "wind_speed": f"{row['wind_speed']:.1f}",
+        "wind_dir": row["wind_dir"],
+        "wind_angle": row["wind_angle"],
+        "cloud_cover": row["cloud_cover"],
+        "prec_total": f"{row['prec_total']:.1f}",
+        "prec_type": row["prec_type"],
+    }
+
+
+@tagged("post_install", "-at_install", "-standard", "weather_benchmark")
+class TestPayloadBenchmark(TransactionCase):
+    """Payload conversion of a snapshot of 48 hourly and 30 daily points.
+
+    Not part of the standard run, select it with
+    ``--test-tags weather_benchmark``, the timings are logged.
+    """
+
+    ROUNDS = 200
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        point = load_fixture("point")
+        point["hourly"] = {"data": (point["hourly"]["data"] * 2)[:48]}
+        point["daily"] = {"data": (point["daily"]["data"] * 5)[:30]}
+        cls.place = cls.env.ref("weather.place_london")
+        cls.snapshot = cls.env["weather.snapshot"]._create_from_api(cls.place, point)
+        day = date(2024, 6, 21)
+        Astro = cls.env["weather.astro"]
+        cls.astro = Astro.search(
+            [("place_id", "=", cls.place.id), ("date", "=", day)],
+            limit=1,
+        ) or Astro._precompute(cls.place, day, 1)
+
+    def measure(self, func):
+        """Return the best time of a call of func, in microseconds."""
+        timings = timeit.repeat(func, number=self.ROUNDS, repeat=5)
+        return min(timings) / self.ROUNDS * 1e6
+
+    def test_payload_conversion(self):
+        series = (self.snapshot.hourly, self.snapshot.daily)
+
+        def by_column():
+            return [
+                [day._asdict() for day in DayWeather.from_series(s)] for s in series
+            ]
+
+        def by_row():
+            return [[row_to_json(row) for row in rows(s)] for s in series]
+
+        hourly, daily = by_column()
+        self.assertEqual(len(hourly), 48)
+        self.assertEqual(len(daily), 30)
+        self.assertEqual([hourly, daily], by_row())
+
+        controller = WeatherController()
+        column_time = self.measure(by_column)
+        row_time = self.measure(by_row)
+        payload_time = self.measure(
+            lambda: controller.get_forecast_data(self.place, self.snapshot, self.astro),
+        )
+        _logger.info(
+            "Weather payload of 48 hourly and 30 daily points: series by column "
+            "%.0f us, by row %.0f us (x%.1f), whole payload %.0f us",
+            column_time,
+            row_time,
+            row_time / column_time,
+            payload_time,
+        )
@@ -0,0 +1,21 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestPlace(TransactionCase):
+    def test_alias(self):
+        london = self.env.ref("weather.place_london")
+        Place = self.env["weather.place"]
+        paris = (48.85341, 2.3488)
+        self.assertFalse(Place._find_nearest(*paris))
+
+        london._add_alias(*paris)
+        self.assertEqual(Place._find_nearest(*paris), london)
+        self.assertEqual(Place._find_nearest(48.86, 2.35), london)
+
+    def test_alias_within_radius(self):
+        london = self.env.ref("weather.place_london")
+        london._add_alias(51.51, -0.13)
+        self.assertFalse(
+            self.env["weather.place.alias"].search([("place_id", "=", london.id)]),
+        )
@@ -0,0 +1,54 @@
+from odoo.tests import TransactionCase, tagged
+
+from .common import load_fixture
+from odoo.addons.weather.controllers.weather_api import DayWeather
+
+
+@tagged("post_install", "-at_install")
+class TestSnapshot(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.place = cls.env.ref("weather.place_london")
+        cls.point = load_fixture("point")
+
+    def test_create_from_api(self):
+        snapshot = self.env["weather.snapshot"]._create_from_api(self.place, self.point)
+        self.assertEqual(snapshot.place_id, self.place)
+        self.assertEqual(snapshot.lat, "51.50853N")
+        self.assertEqual(len(snapshot.current["event"]), 1)
+        self.assertEqual(snapshot.current["temperature"], [17.2])
+        self.assertEqual(len(snapshot.hourly["event"]), 24)
+        self.assertEqual(snapshot.hourly["event"][0], "2024-06-21T11:00:00")
+        self.assertEqual(len(snapshot.daily["event"]), 7)
+        self.assertEqual(snapshot.daily["temperature_max"][0], 21.2)
+
+    def test_create_from_api_queries(self):
+        """A fetch is stored with a single INSERT whatever the length of the series."""
+        Snapshot = self.env["weather.snapshot"]
+        with self.assertQueryCount(1):
+            Snapshot._create_from_api(self.place, self.point)
+
+        longer = dict(self.point)
+        longer["hourly"] = {"data": self.point["hourly"]["data"] * 4}
+        longer["daily"] = {"data": self.point["daily"]["data"] * 4}
+        with self.assertQueryCount(1):
+            snapshot = Snapshot._create_from_api(self.place, longer)
+        self.assertEqual(len(snapshot.hourly["event"]), 96)
+
+    def test_day_weather_nulls(self):
+        # The series migrated from the row-per-event table may hold nulls.
+        hourly = (
+            self.env["weather.snapshot"]
+            ._create_from_api(
+                self.place,
+                self.point,
+            )
+            .hourly
+        )
+        hourly["temperature"][0] = None
+        hourly["prec_total"][1] = None
+        points = DayWeather.from_series(hourly)
+        self.assertIsNone(points[0].temperature)
+        self.assertIsNone(points[1].prec_total)
+        self.assertEqual(len(points), 24)
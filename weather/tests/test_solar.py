@@ -0,0 +1,81 @@
+from datetime import date, datetime, timezone
+
+from odoo.tests import BaseCase, TransactionCase, tagged
+
+from .common import load_fixture
+from odoo.addons.weather.controllers.weather_api import WeatherController
+from odoo.addons.weather.utils.solar import solar_events
+
+TROMSO = (69.6489, 18.95508)
+
+
+@tagged("post_install", "-at_install")
+class TestSolarEvents(BaseCase):
+    def test_reference_times(self):
+        """The events are within a minute of the reference times.
+
+        ``fixtures/sunrise_sunset.json`` holds them in the format of the
+        api.sunrise-sunset.org responses (``formatted=0``), as computed by
+        the astral implementation of the NOAA equations. Events close to
+        the horizon limit, where the implementations diverge, are left out.
+        """
+        for reference in load_fixture("sunrise_sunset"):
+            day = date.fromisoformat(reference["date"])
+            events = solar_events(day, reference["lat"], reference["lng"])
+            for name, expected in reference["results"].items():
+                with self.subTest(place=reference["name"], date=day, event=name):
+                    value = events[name]
+                    if name == "day_length":
+                        self.assertAlmostEqual(value, expected, delta=120)
+                    elif expected is None:
+                        self.assertIsNone(value)
+                    else:
+                        expected = datetime.fromisoformat(expected)
+                        value = value.replace(tzinfo=timezone.utc)
+                        self.assertLessEqual(abs(value - expected).total_seconds(), 60)
+
+    def test_polar_day_and_night(self):
+        summer = solar_events(date(2024, 6, 21), *TROMSO)
+        self.assertIsNone(summer["sunrise"])
+        self.assertIsNone(summer["sunset"])
+        self.assertEqual(summer["day_length"], 86400)
+
+        winter = solar_events(date(2024, 12, 21), *TROMSO)
+        self.assertIsNone(winter["sunrise"])
+        self.assertIsNone(winter["sunset"])
+        self.assertEqual(winter["day_length"], 0)
+        self.assertIsNotNone(winter["civil_twilight_begin"])
+
+
+@tagged("post_install", "-at_install")
+class TestPolarPayload(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.place = cls.env["weather.place"].create(
+            {
+                "place_id": "tromso",
+                "name": "Tromsø",
+                "lat": "69.6489N",
+                "lon": "18.95508E",
+                "timezone": "Europe/Oslo",
+            },
+        )
+        cls.snapshot = cls.env["weather.snapshot"]._create_from_api(
+            cls.place,
+            load_fixture("point"),
+        )
+
+    def get_payload(self, day):
+        astro = self.env["weather.astro"]._precompute(self.place, day, 1)
+        return WeatherController().get_forecast_data(self.place, self.snapshot, astro)
+
+    def test_polar_day(self):
+        data = self.get_payload(date(2024, 6, 21))
+        self.assertEqual(data["sunrise"], "2024-06-21 00:00")
+        self.assertEqual(data["sunset"], "2024-06-21 23:59")
+
+    def test_polar_night(self):
+        data = self.get_payload(date(2024, 12, 21))
+        self.assertEqual(data["sunrise"], data["sunset"])
+        self.assertTrue(data["sunrise"].startswith("2024-12-21 11:"))
@@ -0,0 +1,31 @@
+import math
+
+EARTH_RADIUS = 6371.0  # kilometers
+
+
+def parse_coordinate(value) -> float:
+    """Parse a coordinate as sent by Meteosource ("53.9N", "27.56E") or plain.
+
+    Southern latitudes and western longitudes are negative. Raise
+    ``ValueError`` or ``TypeError`` for anything else.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.strip()
+    sign = 1
+    if value and value[-1].upper() in "NSEW":
+        sign = -1 if value[-1].upper() in "SW" else 1
+        value = value[:-1]
+    return sign * float(value)
+
+
+def distance(lat1, lon1, lat2, lon2) -> float:
+    """Great-circle distance in kilometers."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
@@ -0,0 +1,211 @@
+"""Meteosource HTTP calls.
+
+These functions don't touch the database, so that they can run in the
+``UPSTREAM_POOL`` threads while the request cursor stores the results.
+They raise ``WeatherError`` with the name of the calling procedure.
+
+The calls go through one keep-alive session per upstream host, with
+connect and read timeouts, bounded retries with jitter and a response
+size limit. Latency and error counters are kept per endpoint, for the
+current worker process, see :func:`get_stats`. The responses can be
+replayed from recorded fixtures, see ``utils/replay.py``.
+"""
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from odoo.tools import config, str2bool
+
+from ..constants import (
+    API_WEATHER_KEY,
+    API_WEATHER_TZ,
+    UPSTREAM_BACKOFF,
+    UPSTREAM_CONNECT_TIMEOUT,
+    UPSTREAM_MAX_RESPONSE_SIZE,
+    UPSTREAM_READ_TIMEOUT,
+    UPSTREAM_RETRIES,
+    UPSTREAM_RETRY_STATUSES,
+    UPSTREAM_WORKERS,
+    find_places_prefix_api,
+    forecast_api,
+    forecast_point_api,
+    nearest_place_api,
+)
+from ..exceptions import WeatherError
+from .replay import ReplayAdapter
+
+UPSTREAM_POOL = ThreadPoolExecutor(
+    max_workers=UPSTREAM_WORKERS,
+    thread_name_prefix="weather_upstream",
+)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _session(url):
+    """Return the pooled session of the host of the url."""
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            fixtures = config.get("weather_upstream_fixtures")
+            if fixtures:
+                adapter = ReplayAdapter(
+                    fixtures,
+                    latency=float(config.get("weather_upstream_latency") or 0),
+                    record=str2bool(config.get("weather_upstream_record") or "0"),
+                    pool_connections=1,
+                    pool_maxsize=UPSTREAM_WORKERS,
+                )
+            else:
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=UPSTREAM_WORKERS,
+                )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(
+                {"accept": "application/json", "accept-encoding": "gzip, deflate"},
+            )
+            _sessions[host] = session
+        return session
+
+
+def _record(endpoint, duration, retries, error=None):
+    with _stats_lock:
+        stats = _stats.setdefault(
+            endpoint,
+            {
+                "calls": 0,
+                "retries": 0,
+                "errors": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "last_error": "",
+            },
+        )
+        stats["calls"] += 1
+        stats["retries"] += retries
+        stats["total_ms"] += duration
+        stats["max_ms"] = max(stats["max_ms"], duration)
+        if error:
+            stats["errors"] += 1
+            stats["last_error"] = error
+
+
+def get_stats():
+    """Return a copy of the per-endpoint counters of this worker."""
+    with _stats_lock:
+        return {endpoint: dict(stats) for endpoint, stats in _stats.items()}
+
+
+def _read(resp, method_name, error_prefix=""):
+    """Return the body of the streamed response, up to the size limit.
+
+    The body is only downloaded here, so its read errors are mapped to
+    WeatherError as well.
+    """
+    with resp:
+        if resp.status_code != 200:
+            raise WeatherError(
+                method_name,
+                f"{error_prefix}Bad response status code: {resp.status_code}",
+            )
+        length = resp.headers.get("content-length")
+        if length and length.isdigit() and int(length) > UPSTREAM_MAX_RESPONSE_SIZE:
+            raise WeatherError(method_name, f"Response too large: {length} bytes")
+        chunks = []
+        size = 0
+        try:
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > UPSTREAM_MAX_RESPONSE_SIZE:
+                    break
+                chunks.append(chunk)
+        except requests.RequestException as ex:
+            raise WeatherError(method_name, f"Request failed: {ex!s}") from ex
+    if size > UPSTREAM_MAX_RESPONSE_SIZE:
+        raise WeatherError(method_name, f"Response too large: over {size} bytes")
+    return b"".join(chunks)
+
+
+def _get(url, endpoint, method_name, error_prefix=""):
+    session = _session(url)
+    start = time.perf_counter()
+    retries = 0
+    error = None
+    try:
+        while True:
+            try:
+                resp = session.get(
+                    url,
+                    timeout=(UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT),
+                    stream=True,
+                )
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                if retries >= UPSTREAM_RETRIES:
+                    raise WeatherError(method_name, f"Request failed: {ex!s}") from ex
+            except requests.RequestException as ex:
+                raise WeatherError(method_name, f"Request failed: {ex!s}") from ex
+            else:
+                if (
+                    resp.status_code not in UPSTREAM_RETRY_STATUSES
+                    or retries >= UPSTREAM_RETRIES
+                ):
+                    break
+                resp.close()
+            time.sleep(UPSTREAM_BACKOFF * 2**retries * random.uniform(0.5, 1.5))
+            retries += 1
+
+        content = _read(resp, method_name, error_prefix)
+        try:
+            return json.loads(content)
+        except ValueError as ex:
+            raise WeatherError(method_name, f"Invalid JSON response: {ex!s}") from ex
+    except WeatherError as inst:
+        error = inst.args[1]
+        raise
+    finally:
+        _record(endpoint, (time.perf_counter() - start) * 1000, retries, error)
+
+
+def request_places_prefix(text):
+    url = find_places_prefix_api.replace("{text}", text).replace(
+        "{key}",
+        API_WEATHER_KEY,
+    )
+    return _get(url, "find_places_prefix", "get_place", "(1) ")
+
+
+def request_nearest_place(lat, lon):
+    url = nearest_place_api.format(lat=lat, lon=lon, key=API_WEATHER_KEY)
+    return _get(url, "nearest_place", "get_place", "(2) ")
+
+
+def request_forecast(place_id=None, lat=None, lon=None):
+    """Return the point forecast of a Meteosource place id or of coordinates."""
+    if place_id:
+        url = (
+            forecast_api.replace("{place_id}", place_id)
+            .replace("{timezone}", API_WEATHER_TZ)
+            .replace("{key}", API_WEATHER_KEY)
+        )
+    else:
+        url = forecast_point_api.format(
+            lat=lat,
+            lon=lon,
+            timezone=API_WEATHER_TZ,
+            key=API_WEATHER_KEY,
+        )
+    return _get(url, "point", "get_forecast_api_data")
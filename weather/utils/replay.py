@@ -0,0 +1,69 @@
+"""Recorded Meteosource responses, to measure the module offline.
+
+When ``weather_upstream_fixtures`` is set in the Odoo configuration file,
+the upstream sessions get a :class:`ReplayAdapter` instead of the network
+one::
+
+    [options]
+    weather_upstream_fixtures = /path/to/fixtures
+    weather_upstream_latency = 150
+    weather_upstream_record = False
+
+Each endpoint is answered with ``<endpoint>.json`` of the directory, e.g.
+``point.json`` or ``nearest_place.json``, after the configured latency in
+milliseconds, whatever the query parameters. A missing fixture answers 404.
+With ``weather_upstream_record`` the calls go to Meteosource and the
+successful responses are saved as the fixtures instead.
+
+``weather/tests/fixtures`` holds sample responses of the three endpoints,
+used by the tests and by the ``weather_benchmark`` tests.
+"""
+
+import io
+import logging
+import os
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+
+class ReplayAdapter(HTTPAdapter):
+    def __init__(self, path, latency=0, record=False, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.latency = latency
+        self.record = record
+
+    def _fixture(self, url):
+        endpoint = urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+        return os.path.join(self.path, f"{endpoint}.json")
+
+    def send(self, request, **kwargs):
+        fixture = self._fixture(request.url)
+        if self.record:
+            response = super().send(request, **kwargs)
+            if response.status_code == 200:
+                with open(fixture, "wb") as f:
+                    f.write(response.content)
+                _logger.info("Weather upstream response recorded in %s", fixture)
+            return response
+
+        time.sleep(self.latency / 1000)
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        try:
+            with open(fixture, "rb") as f:
+                content = f.read()
+            response.status_code = 200
+            response.headers["content-type"] = "application/json"
+            response.headers["content-length"] = str(len(content))
+        except FileNotFoundError:
+            content = b""
+            response.status_code = 404
+        response.raw = io.BytesIO(content)
+        return response
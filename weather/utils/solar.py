@@ -0,0 +1,129 @@
+"""Sunrise, sunset and twilight times computed locally.
+
+Implementation of the NOAA solar calculator equations
+(https://gml.noaa.gov/grad/solcalc/calcdetails.html). The results are
+within a minute of the NOAA tables, and of api.sunrise-sunset.org which
+uses the same algorithm, for latitudes below the polar circles.
+"""
+
+import math
+from datetime import date, datetime, time, timedelta
+
+# Solar zenith angles, in degrees, of the computed events. The sunrise and
+# sunset one accounts for the atmospheric refraction and the solar disc radius.
+ZENITH_SUNRISE = 90.833
+ZENITH_CIVIL = 96.0
+ZENITH_NAUTICAL = 102.0
+ZENITH_ASTRONOMICAL = 108.0
+
+EVENTS = (
+    ("sunrise", "sunset", ZENITH_SUNRISE),
+    ("civil_twilight_begin", "civil_twilight_end", ZENITH_CIVIL),
+    ("nautical_twilight_begin", "nautical_twilight_end", ZENITH_NAUTICAL),
+    ("astronomical_twilight_begin", "astronomical_twilight_end", ZENITH_ASTRONOMICAL),
+)
+
+JULIAN_DAY_UNIX_EPOCH = 2440587.5
+JULIAN_DAY_J2000 = 2451545.0
+
+
+def _julian_day(day: date) -> float:
+    """Julian day at 0h UTC of the date."""
+    return JULIAN_DAY_UNIX_EPOCH + (day - date(1970, 1, 1)).days
+
+
+def _sun_position(julian_day: float) -> tuple[float, float]:
+    """Return the sun declination in degrees and the equation of time in minutes."""
+    t = (julian_day - JULIAN_DAY_J2000) / 36525
+    mean_long = (280.46646 + t * (36000.76983 + t * 0.0003032)) % 360
+    mean_anom = 357.52911 + t * (35999.05029 - 0.0001537 * t)
+    eccent = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+    m = math.radians(mean_anom)
+    center = (
+        math.sin(m) * (1.914602 - t * (0.004817 + 0.000014 * t))
+        + math.sin(2 * m) * (0.019993 - 0.000101 * t)
+        + math.sin(3 * m) * 0.000289
+    )
+    omega = math.radians(125.04 - 1934.136 * t)
+    app_long = mean_long + center - 0.00569 - 0.00478 * math.sin(omega)
+    mean_obliq = (
+        23 + (26 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60) / 60
+    )
+    obliq = math.radians(mean_obliq + 0.00256 * math.cos(omega))
+    declination = math.degrees(
+        math.asin(math.sin(obliq) * math.sin(math.radians(app_long))),
+    )
+    y = math.tan(obliq / 2) ** 2
+    l0 = math.radians(mean_long)
+    eq_of_time = 4 * math.degrees(
+        y * math.sin(2 * l0)
+        - 2 * eccent * math.sin(m)
+        + 4 * eccent * y * math.sin(m) * math.cos(2 * l0)
+        - 0.5 * y * y * math.sin(4 * l0)
+        - 1.25 * eccent * eccent * math.sin(2 * m),
+    )
+    return declination, eq_of_time
+
+
+def _hour_angle(lat: float, declination: float, zenith: float) -> float | None:
+    """Hour angle in degrees of the zenith, None when the sun never reaches it."""
+    lat_r = math.radians(lat)
+    decl_r = math.radians(declination)
+    cos_ha = math.cos(math.radians(zenith)) / (
+        math.cos(lat_r) * math.cos(decl_r)
+    ) - math.tan(lat_r) * math.tan(decl_r)
+    if not -1 <= cos_ha <= 1:
+        return None
+    return math.degrees(math.acos(cos_ha))
+
+
+def _event_minutes(
+    jd0: float,
+    lat: float,
+    lon: float,
+    zenith: float,
+    rising: bool,
+) -> float | None:
+    """Minutes after 0h UTC of the event, refined with a second pass at its own time."""
+    minutes = 720 - 4 * lon
+    for _i in range(2):
+        declination, eq_of_time = _sun_position(jd0 + minutes / 1440)
+        hour_angle = _hour_angle(lat, declination, zenith)
+        if hour_angle is None:
+            return None
+        noon = 720 - 4 * lon - eq_of_time
+        minutes = noon - 4 * hour_angle if rising else noon + 4 * hour_angle
+    return minutes
+
+
+def solar_events(day: date, lat: float, lon: float) -> dict:
+    """Compute the solar events of the day at the given coordinates.
+
+    The date is the local one: the events are those around the solar noon
+    of that day at this longitude. Times are naive UTC datetimes, events the
+    sun doesn't reach (polar day or night) are ``None``. ``day_length`` is
+    in seconds.
+    """
+    jd0 = _julian_day(day)
+    midnight = datetime.combine(day, time.min)
+
+    def to_datetime(minutes):
+        if minutes is None:
+            return None
+        return midnight + timedelta(seconds=round(minutes * 60))
+
+    _declination, eq_of_time = _sun_position(jd0 + (720 - 4 * lon) / 1440)
+    result = {"solar_noon": to_datetime(720 - 4 * lon - eq_of_time)}
+    for begin, end, zenith in EVENTS:
+        result[begin] = to_datetime(_event_minutes(jd0, lat, lon, zenith, True))
+        result[end] = to_datetime(_event_minutes(jd0, lat, lon, zenith, False))
+
+    if result["sunrise"] and result["sunset"]:
+        result["day_length"] = int(
+            (result["sunset"] - result["sunrise"]).total_seconds(),
+        )
+    else:
+        # No sunrise nor sunset: polar day when the sun is up at noon.
+        declination, _eq_of_time = _sun_position(jd0 + 0.5)
+        result["day_length"] = 86400 if abs(lat - declination) < 90 else 0
+    return result